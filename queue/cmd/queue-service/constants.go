@@ -10,6 +10,7 @@ const (
 	taskTypeDeleteImages    = "xmd:delete_images"
 	taskTypeRetagImage      = "xmd:retag_image"
 	taskTypeRetagImages     = "xmd:retag_images"
+	taskTypeAutotagFile     = "xmd:autotag_file"
 
 	taskListKey              = "xmd:download_task_ids"
 	taskURLHashKey           = "xmd:download_task_urls"
@@ -18,4 +19,5 @@ const (
 	retagLastTask            = "xmd:retag:last_task_id"
 	taskMetaPrefix           = "xmd:task-meta-"
 	maxTrackedTasks          = 200
+	autotagFileMaxRetry      = 5
 )
@@ -0,0 +1,46 @@
+package main
+
+import "sync"
+
+// dirCountCache memoizes per-user tweet counts keyed by the user directory's
+// mtime, which changes whenever an entry is added to or removed from it.
+type dirCountCache struct {
+	mu      sync.Mutex
+	entries map[string]dirCountEntry
+}
+
+type dirCountEntry struct {
+	mtime int64
+	count int
+}
+
+func newDirCountCache() *dirCountCache {
+	return &dirCountCache{entries: make(map[string]dirCountEntry)}
+}
+
+func (c *dirCountCache) get(name string, mtime int64) (int, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	entry, ok := c.entries[name]
+	if !ok || entry.mtime != mtime {
+		return 0, false
+	}
+	return entry.count, true
+}
+
+func (c *dirCountCache) set(name string, mtime int64, count int) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	c.entries[name] = dirCountEntry{mtime: mtime, count: count}
+}
+
+// retain drops entries for directories that no longer exist.
+func (c *dirCountCache) retain(names map[string]struct{}) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	for name := range c.entries {
+		if _, ok := names[name]; !ok {
+			delete(c.entries, name)
+		}
+	}
+}
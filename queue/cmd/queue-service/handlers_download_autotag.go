@@ -8,6 +8,7 @@ import (
 	"time"
 
 	"github.com/google/uuid"
+	"github.com/redis/go-redis/v9"
 )
 
 func (st *appState) handleDownload(w http.ResponseWriter, r *http.Request) {
@@ -34,8 +35,7 @@ func (st *appState) handleDownloadPost(w http.ResponseWriter, r *http.Request) {
 	}
 
 	ctx := r.Context()
-	count := 0
-	queued := make([]map[string]string, 0)
+	queued := make([]map[string]string, 0, len(body.URLs))
 	for _, rawURL := range body.URLs {
 		url := strings.TrimSpace(rawURL)
 		if !isTweetURL(url) {
@@ -53,15 +53,13 @@ func (st *appState) handleDownloadPost(w http.ResponseWriter, r *http.Request) {
 			)
 			continue
 		}
-
-		setTaskState(ctx, st.redis, taskID, "PENDING", map[string]any{"status": "Queued"})
-		st.redis.RPush(ctx, taskListKey, taskID)
-		st.redis.HSet(ctx, taskURLHashKey, taskID, url)
-		count++
 		queued = append(queued, map[string]string{"task_id": taskID, "url": url})
 	}
+	count := len(queued)
+	if count > 0 {
+		st.trackQueuedDownloads(ctx, queued)
+	}
 
-	st.redis.LTrim(ctx, taskListKey, -maxTrackedTasks, -1)
 	logger.Info("download tasks queued", "count", count)
 	writeJSON(w, http.StatusOK, map[string]any{
 		"success":      true,
@@ -70,6 +68,31 @@ func (st *appState) handleDownloadPost(w http.ResponseWriter, r *http.Request) {
 	})
 }
 
+// trackQueuedDownloads records the queued tasks' PENDING state, status-list
+// entries and URLs in one Redis round trip. SETNX keeps a state the worker
+// may already have written for a fast task.
+func (st *appState) trackQueuedDownloads(ctx context.Context, queued []map[string]string) {
+	state := encodeTaskState("PENDING", map[string]any{"status": "Queued"})
+	ids := make([]any, 0, len(queued))
+	urls := make([]any, 0, 2*len(queued))
+	for _, q := range queued {
+		ids = append(ids, q["task_id"])
+		urls = append(urls, q["task_id"], q["url"])
+	}
+	_, err := st.redis.Pipelined(ctx, func(pipe redis.Pipeliner) error {
+		for _, q := range queued {
+			pipe.SetNX(ctx, taskMetaPrefix+q["task_id"], state, taskStateTTL)
+		}
+		pipe.RPush(ctx, taskListKey, ids...)
+		pipe.HSet(ctx, taskURLHashKey, urls...)
+		pipe.LTrim(ctx, taskListKey, -maxTrackedTasks, -1)
+		return nil
+	})
+	if err != nil {
+		logger.Error("failed to record queued download tasks", "count", len(queued), "error", err)
+	}
+}
+
 func (st *appState) handleDownloadGet(w http.ResponseWriter, r *http.Request) {
 	ctx := r.Context()
 	requested := strings.TrimSpace(r.URL.Query().Get("ids"))
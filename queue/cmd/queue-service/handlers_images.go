@@ -4,8 +4,6 @@ import (
 	"fmt"
 	"math/rand"
 	"net/http"
-	"os"
-	"path/filepath"
 	"sort"
 	"strings"
 	"time"
@@ -82,39 +80,33 @@ func (st *appState) handleImagesGet(w http.ResponseWriter, r *http.Request) {
 	maxTagCount := parseNonNegativeInt(r.URL.Query().Get("max_tag_count"), -1)
 	excludeTags := splitCSV(r.URL.Query().Get("exclude_tags"))
 
-	type imageInfo struct {
-		Path  string
-		MTime int64
+	if sortMode == "random" && !returnAll && len(searchTags) == 0 &&
+		minTagCount < 0 && maxTagCount < 0 && len(excludeTags) == 0 {
+		st.handleImagesRandomPage(w, page, perPage)
+		return
+	}
+
+	if sortMode != "random" && !returnAll && minTagCount < 0 && maxTagCount < 0 && len(excludeTags) == 0 {
+		if st.handleImagesLatestPage(w, searchTags, page, perPage) {
+			return
+		}
 	}
-	allImages := make([]imageInfo, 0)
 
+	var allImages []mediaFile
 	if len(searchTags) > 0 {
-		paths, err := st.store.FindFilesByTagPatterns(searchTags)
+		var err error
+		allImages, err = st.store.FindMediaFilesByTagPatterns(searchTags)
 		if err != nil {
 			internalServerError(w)
 			return
 		}
-		for _, p := range paths {
-			full := filepath.Join(st.cfg.mediaRoot, filepath.FromSlash(p))
-			info, err := os.Stat(full)
-			if err != nil {
-				continue
-			}
-			allImages = append(allImages, imageInfo{Path: p, MTime: info.ModTime().UnixMilli()})
-		}
 	} else {
-		files, err := listImageFiles(st.cfg.mediaRoot)
+		var err error
+		allImages, err = st.indexedMediaFiles()
 		if err != nil {
 			internalServerError(w)
 			return
 		}
-		for _, full := range files {
-			info, err := os.Stat(full)
-			if err != nil {
-				continue
-			}
-			allImages = append(allImages, imageInfo{Path: normalizeRelPath(st.cfg.mediaRoot, full), MTime: info.ModTime().UnixMilli()})
-		}
 	}
 
 	allTagsMap := map[string][]imageTag{}
@@ -130,7 +122,7 @@ func (st *appState) handleImagesGet(w http.ResponseWriter, r *http.Request) {
 		}
 		allTagsMap = tagsMap
 
-		filtered := make([]imageInfo, 0, len(allImages))
+		filtered := make([]mediaFile, 0, len(allImages))
 		for _, img := range allImages {
 			tagsForImage := tagsMap[img.Path]
 			if hasTagPattern(tagsForImage, excludeTags) {
@@ -185,6 +177,99 @@ func (st *appState) handleImagesGet(w http.ResponseWriter, r *http.Request) {
 	writePaginatedResponse(w, items, totalItems, perPage, page, returnAll, 0)
 }
 
+// handleImagesLatestPage serves an unfiltered newest-first page with
+// LIMIT/OFFSET in SQL. It reports false, writing nothing, when the media
+// index is still empty and the caller should build it via the full listing.
+func (st *appState) handleImagesLatestPage(w http.ResponseWriter, searchTags []string, page, perPage int) bool {
+	offset := (page - 1) * perPage
+	var (
+		totalItems int
+		pageImages []mediaFile
+		err        error
+	)
+	if len(searchTags) > 0 {
+		totalItems, err = st.store.CountMediaFilesByTagPatterns(searchTags)
+		if err == nil && totalItems > offset {
+			pageImages, err = st.store.FindMediaFilesByTagPatternsPage(searchTags, offset, perPage)
+		}
+	} else {
+		totalItems, err = st.store.CountMediaFiles()
+		if err == nil && totalItems == 0 {
+			return false
+		}
+		if err == nil && totalItems > offset {
+			pageImages, err = st.store.ListMediaFilesPage(offset, perPage)
+		}
+	}
+	if err != nil {
+		internalServerError(w)
+		return true
+	}
+
+	paths := make([]string, 0, len(pageImages))
+	for _, img := range pageImages {
+		paths = append(paths, img.Path)
+	}
+	tagsMap, err := st.store.GetTagsForFiles(paths)
+	if err != nil {
+		internalServerError(w)
+		return true
+	}
+
+	items := make([]any, 0, len(pageImages))
+	for _, img := range pageImages {
+		items = append(items, map[string]any{
+			"path": img.Path,
+			"tags": tagsMap[img.Path],
+		})
+	}
+	writePaginatedResponse(w, items, totalItems, perPage, page, false, 0)
+	return true
+}
+
+// handleImagesRandomPage samples one page of random images in SQL instead of
+// shuffling the full listing.
+func (st *appState) handleImagesRandomPage(w http.ResponseWriter, page, perPage int) {
+	totalItems, err := st.store.CountMediaFiles()
+	if err != nil {
+		internalServerError(w)
+		return
+	}
+	if totalItems == 0 {
+		files, err := st.indexedMediaFiles()
+		if err != nil {
+			internalServerError(w)
+			return
+		}
+		totalItems = len(files)
+	}
+
+	start, end := pageBounds((page-1)*perPage, perPage, totalItems)
+	sample, err := st.store.RandomMediaFiles(end - start)
+	if err != nil {
+		internalServerError(w)
+		return
+	}
+	paths := make([]string, 0, len(sample))
+	for _, img := range sample {
+		paths = append(paths, img.Path)
+	}
+	tagsMap, err := st.store.GetTagsForFiles(paths)
+	if err != nil {
+		internalServerError(w)
+		return
+	}
+
+	items := make([]any, 0, len(sample))
+	for _, img := range sample {
+		items = append(items, map[string]any{
+			"path": img.Path,
+			"tags": tagsMap[img.Path],
+		})
+	}
+	writePaginatedResponse(w, items, totalItems, perPage, page, false, 0)
+}
+
 func (st *appState) handleImagesDelete(w http.ResponseWriter, r *http.Request) {
 	var body struct {
 		Filepath string `json:"filepath"`
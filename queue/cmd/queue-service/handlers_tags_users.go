@@ -40,21 +40,10 @@ func (st *appState) handleTagsGet(w http.ResponseWriter, r *http.Request) {
 		internalServerError(w)
 		return
 	}
-	filtered := make([]map[string]any, 0, len(tags))
+	filtered := make([]tagCount, 0, len(tags))
 	for _, item := range tags {
-		tagVal, _ := item["tag"].(string)
-		countInt := 0
-		switch v := item["count"].(type) {
-		case int:
-			countInt = v
-		case int64:
-			countInt = int(v)
-		case float64:
-			countInt = int(v)
-		}
-
 		if q != "" {
-			tagLower := strings.ToLower(tagVal)
+			tagLower := strings.ToLower(item.Tag)
 			if match == "exact" {
 				if tagLower != q {
 					continue
@@ -63,53 +52,38 @@ func (st *appState) handleTagsGet(w http.ResponseWriter, r *http.Request) {
 				continue
 			}
 		}
-		if minCount >= 0 && countInt < minCount {
+		if minCount >= 0 && item.Count < minCount {
 			continue
 		}
-		if maxCount >= 0 && countInt > maxCount {
+		if maxCount >= 0 && item.Count > maxCount {
 			continue
 		}
-		filtered = append(filtered, map[string]any{
-			"tag":   tagVal,
-			"count": countInt,
-		})
+		filtered = append(filtered, item)
 	}
 	tags = filtered
 
 	switch sortBy {
 	case "name_desc":
 		sort.Slice(tags, func(i, j int) bool {
-			a, _ := tags[i]["tag"].(string)
-			b, _ := tags[j]["tag"].(string)
-			return strings.ToLower(a) > strings.ToLower(b)
+			return strings.ToLower(tags[i].Tag) > strings.ToLower(tags[j].Tag)
 		})
 	case "count_asc":
 		sort.Slice(tags, func(i, j int) bool {
-			a, _ := tags[i]["count"].(int)
-			b, _ := tags[j]["count"].(int)
-			if a == b {
-				at, _ := tags[i]["tag"].(string)
-				bt, _ := tags[j]["tag"].(string)
-				return strings.ToLower(at) < strings.ToLower(bt)
+			if tags[i].Count == tags[j].Count {
+				return strings.ToLower(tags[i].Tag) < strings.ToLower(tags[j].Tag)
 			}
-			return a < b
+			return tags[i].Count < tags[j].Count
 		})
 	case "name_asc":
 		sort.Slice(tags, func(i, j int) bool {
-			a, _ := tags[i]["tag"].(string)
-			b, _ := tags[j]["tag"].(string)
-			return strings.ToLower(a) < strings.ToLower(b)
+			return strings.ToLower(tags[i].Tag) < strings.ToLower(tags[j].Tag)
 		})
 	default:
 		sort.Slice(tags, func(i, j int) bool {
-			a, _ := tags[i]["count"].(int)
-			b, _ := tags[j]["count"].(int)
-			if a == b {
-				at, _ := tags[i]["tag"].(string)
-				bt, _ := tags[j]["tag"].(string)
-				return strings.ToLower(at) < strings.ToLower(bt)
+			if tags[i].Count == tags[j].Count {
+				return strings.ToLower(tags[i].Tag) < strings.ToLower(tags[j].Tag)
 			}
-			return a > b
+			return tags[i].Count > tags[j].Count
 		})
 	}
 
@@ -208,17 +182,19 @@ func (st *appState) handleUsersGet(w http.ResponseWriter, r *http.Request) {
 		TweetCount int    `json:"tweet_count"`
 	}
 	users := make([]userInfo, 0)
-	entries, err := os.ReadDir(st.cfg.mediaRoot)
+	entries, err := readDirUnsorted(st.cfg.mediaRoot)
 	if err != nil && !errors.Is(err, os.ErrNotExist) {
 		internalServerError(w)
 		return
 	}
 
+	seen := make(map[string]struct{}, len(entries))
 	for _, entry := range entries {
 		if !entry.IsDir() {
 			continue
 		}
 		username := entry.Name()
+		seen[username] = struct{}{}
 		if q != "" {
 			usernameLower := strings.ToLower(username)
 			if match == "exact" {
@@ -229,12 +205,10 @@ func (st *appState) handleUsersGet(w http.ResponseWriter, r *http.Request) {
 				continue
 			}
 		}
-		userPath := filepath.Join(st.cfg.mediaRoot, username)
-		tweetIDs, err := collectUserTweetIDs(userPath)
+		tweetCount, err := st.userTweetCount(username, entry)
 		if err != nil {
 			continue
 		}
-		tweetCount := len(tweetIDs)
 		if tweetCount <= 0 {
 			continue
 		}
@@ -246,6 +220,7 @@ func (st *appState) handleUsersGet(w http.ResponseWriter, r *http.Request) {
 		}
 		users = append(users, userInfo{Username: username, TweetCount: tweetCount})
 	}
+	st.userCounts.retain(seen)
 	switch sortBy {
 	case "name_desc":
 		sort.Slice(users, func(i, j int) bool { return strings.ToLower(users[i].Username) > strings.ToLower(users[j].Username) })
@@ -276,6 +251,25 @@ func (st *appState) handleUsersGet(w http.ResponseWriter, r *http.Request) {
 	writePaginatedResponse(w, items, totalItems, perPage, page, allItems, 1)
 }
 
+// userTweetCount returns the number of tweets stored for username, reusing the
+// cached count while the user directory's mtime is unchanged.
+func (st *appState) userTweetCount(username string, entry os.DirEntry) (int, error) {
+	info, err := entry.Info()
+	if err != nil {
+		return 0, err
+	}
+	mtime := info.ModTime().UnixNano()
+	if count, ok := st.userCounts.get(username, mtime); ok {
+		return count, nil
+	}
+	tweetIDs, err := collectUserTweetIDs(filepath.Join(st.cfg.mediaRoot, username))
+	if err != nil {
+		return 0, err
+	}
+	st.userCounts.set(username, mtime, len(tweetIDs))
+	return len(tweetIDs), nil
+}
+
 func (st *appState) handleUsersDelete(w http.ResponseWriter, r *http.Request) {
 	var body struct {
 		Username string `json:"username"`
@@ -344,9 +338,8 @@ func (st *appState) handleUserTweetsGet(w http.ResponseWriter, r *http.Request,
 		writeJSON(w, http.StatusNotFound, map[string]any{"error": "User not found"})
 		return
 	}
-	entries, err := os.ReadDir(userPath)
-	if err != nil {
-		if errors.Is(err, os.ErrNotExist) {
+	if info, err := os.Stat(userPath); err != nil || !info.IsDir() {
+		if err == nil || errors.Is(err, os.ErrNotExist) {
 			writeJSON(w, http.StatusNotFound, map[string]any{"error": "User not found"})
 			return
 		}
@@ -354,33 +347,31 @@ func (st *appState) handleUserTweetsGet(w http.ResponseWriter, r *http.Request,
 		return
 	}
 
+	// Group the user's images from the media index instead of reading every
+	// tweet directory. Paths arrive sorted, so each tweet's images are in order.
+	userFiles, err := st.userMediaPaths(username)
+	if err != nil {
+		internalServerError(w)
+		return
+	}
+	userPrefix := username + "/"
 	imagesByTweet := make(map[string][]string)
-	for _, entry := range entries {
-		entryPath := filepath.Join(userPath, entry.Name())
-		if entry.IsDir() {
-			tweetID := entry.Name()
-			imgEntries, err := os.ReadDir(entryPath)
-			if err != nil {
+	for _, p := range userFiles {
+		rest := strings.TrimPrefix(p, userPrefix)
+		var tweetID string
+		if dir, name, nested := strings.Cut(rest, "/"); nested {
+			// Legacy layout: one directory per tweet, one level deep.
+			if strings.Contains(name, "/") {
 				continue
 			}
-			for _, img := range imgEntries {
-				if img.IsDir() || !isImageFile(img.Name()) {
-					continue
-				}
-				full := filepath.Join(entryPath, img.Name())
-				imagesByTweet[tweetID] = append(imagesByTweet[tweetID], normalizeRelPath(st.cfg.mediaRoot, full))
-			}
-			continue
-		}
-
-		if !isImageFile(entry.Name()) {
-			continue
+			tweetID = dir
+		} else {
+			tweetID = tweetIDFromFilename(rest)
 		}
-		tweetID := tweetIDFromFilename(entry.Name())
 		if tweetID == "" {
 			continue
 		}
-		imagesByTweet[tweetID] = append(imagesByTweet[tweetID], normalizeRelPath(st.cfg.mediaRoot, entryPath))
+		imagesByTweet[tweetID] = append(imagesByTweet[tweetID], p)
 	}
 
 	tweetIDs := make([]string, 0, len(imagesByTweet))
@@ -395,20 +386,51 @@ func (st *appState) handleUserTweetsGet(w http.ResponseWriter, r *http.Request,
 		TweetID string `json:"tweet_id"`
 		Images  []any  `json:"images"`
 	}
-	tweets := make([]tweet, 0, len(tweetIDs))
-	for _, tweetID := range tweetIDs {
-		imagePaths := imagesByTweet[tweetID]
-		if len(imagePaths) == 0 {
-			continue
-		}
-		sort.Strings(imagePaths)
+	filterByTags := minTagCount >= 0 || maxTagCount >= 0 || len(excludeTags) > 0
 
-		tagsMap, err := st.store.GetTagsForFiles(imagePaths)
+	// Without tag filters the tweet list is final, so only the page being returned needs tags.
+	if !filterByTags {
+		totalItems := len(tweetIDs)
+		pageIDs := tweetIDs
+		if !returnAll {
+			start, end := pageBounds(offset, perPage, totalItems)
+			pageIDs = tweetIDs[start:end]
+		}
+		pagePaths := make([]string, 0, len(pageIDs))
+		for _, tweetID := range pageIDs {
+			pagePaths = append(pagePaths, imagesByTweet[tweetID]...)
+		}
+		tagsMap, err := st.store.GetTagsForFiles(pagePaths)
 		if err != nil {
 			internalServerError(w)
 			return
 		}
+		tweets := make([]tweet, 0, len(pageIDs))
+		for _, tweetID := range pageIDs {
+			imagePaths := imagesByTweet[tweetID]
+			images := make([]any, 0, len(imagePaths))
+			for _, p := range imagePaths {
+				images = append(images, map[string]any{"path": p, "tags": tagsMap[p]})
+			}
+			tweets = append(tweets, tweet{TweetID: tweetID, Images: images})
+		}
+		writePaginatedResponse(w, tweets, totalItems, perPage, page, returnAll, 0)
+		return
+	}
 
+	allPaths := make([]string, 0)
+	for _, tweetID := range tweetIDs {
+		allPaths = append(allPaths, imagesByTweet[tweetID]...)
+	}
+	tagsMap, err := st.store.GetTagsForFiles(allPaths)
+	if err != nil {
+		internalServerError(w)
+		return
+	}
+
+	tweets := make([]tweet, 0, len(tweetIDs))
+	for _, tweetID := range tweetIDs {
+		imagePaths := imagesByTweet[tweetID]
 		images := make([]any, 0, len(imagePaths))
 		for _, p := range imagePaths {
 			tagsForImage := tagsMap[p]
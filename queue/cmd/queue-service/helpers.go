@@ -1,8 +1,9 @@
 package main
 
 import (
+	"bytes"
 	"context"
-	"crypto/md5"
+	"encoding/binary"
 	"encoding/hex"
 	"encoding/json"
 	"errors"
@@ -12,17 +13,29 @@ import (
 	"os"
 	"path/filepath"
 	"regexp"
+	"runtime"
 	"sort"
+	"strconv"
 	"strings"
+	"sync"
 	"time"
 
+	"github.com/cespare/xxhash/v2"
 	"github.com/hibiken/asynq"
 )
 
-func setTaskState(ctx context.Context, rdb RedisClient, taskID, status string, result interface{}) {
+// taskStateTTL is how long task-meta records are kept in Redis.
+const taskStateTTL = 7 * 24 * time.Hour
+
+func encodeTaskState(status string, result interface{}) []byte {
 	rec := queueTaskStatus{Status: status, Result: result, UpdatedAt: time.Now().UTC().Format(time.RFC3339)}
 	b, _ := json.Marshal(rec)
-	if err := rdb.Set(ctx, taskMetaPrefix+taskID, b, 7*24*time.Hour).Err(); err != nil {
+	return b
+}
+
+func setTaskState(ctx context.Context, rdb RedisClient, taskID, status string, result interface{}) {
+	b := encodeTaskState(status, result)
+	if err := rdb.Set(ctx, taskMetaPrefix+taskID, b, taskStateTTL).Err(); err != nil {
 		logger.Error("failed to persist task state", "task_id", taskID, "status", status, "error", err)
 	}
 
@@ -80,10 +93,32 @@ func getDownloadAutotagState(ctx context.Context, rdb RedisClient) (queueTaskSta
 	return rec, true
 }
 
+var jsonBufPool = sync.Pool{
+	New: func() any { return new(bytes.Buffer) },
+}
+
 func writeJSON(w http.ResponseWriter, status int, payload interface{}) {
+	buf := jsonBufPool.Get().(*bytes.Buffer)
+	buf.Reset()
+	defer func() {
+		// Don't pin huge buffers from all=1 listings in the pool.
+		if buf.Cap() <= 1<<20 {
+			jsonBufPool.Put(buf)
+		}
+	}()
+
+	enc := json.NewEncoder(buf)
+	if err := enc.Encode(payload); err != nil {
+		logger.Error("failed to encode json response", "error", err)
+		w.Header().Set("Content-Type", "application/json")
+		w.WriteHeader(http.StatusInternalServerError)
+		_, _ = w.Write([]byte(`{"error":"Internal Server Error"}` + "\n"))
+		return
+	}
 	w.Header().Set("Content-Type", "application/json")
+	w.Header().Set("Content-Length", strconv.Itoa(buf.Len()))
 	w.WriteHeader(status)
-	_ = json.NewEncoder(w).Encode(payload)
+	_, _ = w.Write(buf.Bytes())
 }
 
 func internalServerError(w http.ResponseWriter) {
@@ -123,18 +158,20 @@ func normalizeUniqueFilepaths(rawPaths []string) []string {
 	return filepaths
 }
 
-func (st *appState) enqueueTask(taskType, queueName, taskID string, payload any, timeout time.Duration) error {
+// enqueueTask enqueues a task that is not retried; opts are applied after the
+// defaults and so can override them.
+func (st *appState) enqueueTask(taskType, queueName, taskID string, payload any, timeout time.Duration, opts ...asynq.Option) error {
 	b, err := json.Marshal(payload)
 	if err != nil {
 		return err
 	}
 	task := asynq.NewTask(taskType, b)
-	_, err = st.asynqCli.Enqueue(task,
+	_, err = st.asynqCli.Enqueue(task, append([]asynq.Option{
 		asynq.Queue(queueName),
 		asynq.TaskID(taskID),
 		asynq.MaxRetry(0),
 		asynq.Timeout(timeout),
-	)
+	}, opts...)...)
 	return err
 }
 
@@ -309,6 +346,21 @@ func countImages(root string) int {
 	return count
 }
 
+func hasAnyImage(root string) bool {
+	found := false
+	_ = filepath.WalkDir(root, func(path string, d os.DirEntry, err error) error {
+		if err != nil || d.IsDir() {
+			return nil
+		}
+		if isImageFile(d.Name()) {
+			found = true
+			return filepath.SkipAll
+		}
+		return nil
+	})
+	return found
+}
+
 func cleanupEmptyParents(startFilePath, uploadRoot string) error {
 	absRoot, err := filepath.Abs(uploadRoot)
 	if err != nil {
@@ -323,8 +375,7 @@ func cleanupEmptyParents(startFilePath, uploadRoot string) error {
 		if absCurrent == absRoot || !strings.HasPrefix(absCurrent, absRoot+string(os.PathSeparator)) {
 			return nil
 		}
-		entries, err := os.ReadDir(absCurrent)
-		if err != nil || len(entries) > 0 {
+		if empty, err := isEmptyDir(absCurrent); err != nil || !empty {
 			return nil
 		}
 		if err := os.Remove(absCurrent); err != nil {
@@ -334,6 +385,22 @@ func cleanupEmptyParents(startFilePath, uploadRoot string) error {
 	}
 }
 
+// isEmptyDir reads at most one entry instead of listing and sorting the whole directory.
+func isEmptyDir(dir string) (bool, error) {
+	f, err := os.Open(dir)
+	if err != nil {
+		return false, err
+	}
+	defer f.Close()
+	if _, err := f.Readdirnames(1); err != nil {
+		if errors.Is(err, io.EOF) {
+			return true, nil
+		}
+		return false, err
+	}
+	return false, nil
+}
+
 func toMap(v interface{}) map[string]any {
 	b, _ := json.Marshal(v)
 	m := make(map[string]any)
@@ -341,28 +408,51 @@ func toMap(v interface{}) map[string]any {
 	return m
 }
 
+var (
+	tweetUsernameRe   = regexp.MustCompile(`(?:x|twitter)\.com/([^/]+)/status/`)
+	photoSizeSuffixRe = regexp.MustCompile(`:\w+$`)
+)
+
 func extractUsername(tweetURL string) string {
-	re := regexp.MustCompile(`(?:x|twitter)\.com/([^/]+)/status/`)
-	m := re.FindStringSubmatch(tweetURL)
+	m := tweetUsernameRe.FindStringSubmatch(tweetURL)
 	if len(m) > 1 {
 		return m[1]
 	}
 	return "unknown_user"
 }
 
-var tweetIDFilenameRe = regexp.MustCompile(`^(\d+)_\d+`)
-
+// tweetIDFromFilename returns the leading digits of a "<tweetID>_<index>.<ext>"
+// name. It runs for every file in user listings, so it scans bytes rather
+// than going through the regexp engine.
 func tweetIDFromFilename(name string) string {
 	base := strings.TrimSuffix(name, filepath.Ext(name))
-	m := tweetIDFilenameRe.FindStringSubmatch(base)
-	if len(m) > 1 {
-		return m[1]
+	i := 0
+	for i < len(base) && isASCIIDigit(base[i]) {
+		i++
+	}
+	if i == 0 || i+1 >= len(base) || base[i] != '_' || !isASCIIDigit(base[i+1]) {
+		return ""
+	}
+	return base[:i]
+}
+
+func isASCIIDigit(c byte) bool {
+	return c >= '0' && c <= '9'
+}
+
+// readDirUnsorted is os.ReadDir without the name sort, for callers that
+// aggregate or reorder entries themselves.
+func readDirUnsorted(dir string) ([]os.DirEntry, error) {
+	f, err := os.Open(dir)
+	if err != nil {
+		return nil, err
 	}
-	return ""
+	defer f.Close()
+	return f.ReadDir(-1)
 }
 
 func collectUserTweetIDs(userPath string) (map[string]struct{}, error) {
-	entries, err := os.ReadDir(userPath)
+	entries, err := readDirUnsorted(userPath)
 	if err != nil {
 		if errors.Is(err, os.ErrNotExist) {
 			return map[string]struct{}{}, nil
@@ -387,15 +477,13 @@ func collectUserTweetIDs(userPath string) (map[string]struct{}, error) {
 	return tweetIDs, nil
 }
 
-func getTweetImages(tweetURL string) ([]string, error) {
+func getTweetImages(ctx context.Context, client *http.Client, tweetURL string) ([]string, error) {
 	tweetID := tweetIDFromURL(tweetURL)
 	if tweetID == "" {
 		return nil, errors.New("invalid tweet id")
 	}
 	apiURL := fmt.Sprintf("https://cdn.syndication.twimg.com/tweet-result?id=%s&token=4", tweetID)
-	req, _ := http.NewRequest(http.MethodGet, apiURL, nil)
-	req.Header.Set("User-Agent", "Mozilla/5.0")
-	client := &http.Client{Timeout: 10 * time.Second}
+	req, _ := http.NewRequestWithContext(ctx, http.MethodGet, apiURL, nil)
 	resp, err := client.Do(req)
 	if err != nil {
 		return nil, err
@@ -404,32 +492,30 @@ func getTweetImages(tweetURL string) ([]string, error) {
 	if resp.StatusCode >= 400 {
 		return nil, fmt.Errorf("tweet api status=%d", resp.StatusCode)
 	}
-	body, err := io.ReadAll(resp.Body)
-	if err != nil {
-		return nil, err
-	}
 
+	// Decode straight off the connection; only the photo URLs are kept.
 	var parsed struct {
 		Photos []struct {
 			URL string `json:"url"`
 		} `json:"photos"`
 	}
-	if err := json.Unmarshal(body, &parsed); err != nil {
+	if err := json.NewDecoder(resp.Body).Decode(&parsed); err != nil {
 		return nil, err
 	}
-	uniq := make(map[string]struct{})
+	// Keep the tweet's photo order so file indexes match the order on the tweet.
+	seen := make(map[string]struct{}, len(parsed.Photos))
+	images := make([]string, 0, len(parsed.Photos))
 	for _, p := range parsed.Photos {
 		if p.URL == "" {
 			continue
 		}
-		u := regexp.MustCompile(`:\\w+$`).ReplaceAllString(p.URL, ":orig")
-		uniq[u] = struct{}{}
-	}
-	images := make([]string, 0, len(uniq))
-	for u := range uniq {
+		u := photoSizeSuffixRe.ReplaceAllString(p.URL, ":orig")
+		if _, ok := seen[u]; ok {
+			continue
+		}
+		seen[u] = struct{}{}
 		images = append(images, u)
 	}
-	sort.Strings(images)
 	return images, nil
 }
 
@@ -454,25 +540,266 @@ func listImageFiles(root string) ([]string, error) {
 	return files, nil
 }
 
+// scanMediaFiles walks root and returns every image with its mtime in milliseconds.
+func scanMediaFiles(root string) ([]mediaFile, error) {
+	prefix := walkPrefix(root)
+	files := make([]mediaFile, 0)
+	err := filepath.WalkDir(root, func(path string, d os.DirEntry, err error) error {
+		if err != nil || d.IsDir() || !isImageFile(d.Name()) {
+			return nil
+		}
+		info, err := d.Info()
+		if err != nil {
+			return nil
+		}
+		files = append(files, mediaFile{Path: trimWalkPrefix(root, prefix, path), MTime: info.ModTime().UnixMilli()})
+		return nil
+	})
+	if err != nil {
+		return nil, err
+	}
+	return files, nil
+}
+
+// staleDownloadAge is how old a ".download-*" temp file must be before it is
+// treated as abandoned; it is well past the download task timeout.
+const staleDownloadAge = time.Hour
+
+// removeStaleDownloads deletes temp files left under root by a worker that was
+// killed between creating and renaming them. Newer files are kept because
+// another worker may still be writing them.
+func removeStaleDownloads(root string) int {
+	cutoff := time.Now().Add(-staleDownloadAge)
+	removed := 0
+	_ = filepath.WalkDir(root, func(path string, d os.DirEntry, err error) error {
+		if err != nil || d.IsDir() || !strings.HasPrefix(d.Name(), ".download-") {
+			return nil
+		}
+		info, err := d.Info()
+		if err != nil || info.ModTime().After(cutoff) {
+			return nil
+		}
+		if os.Remove(path) == nil {
+			removed++
+		}
+		return nil
+	})
+	return removed
+}
+
+// reindexMediaFiles rebuilds the media_files index from a full walk of the media root.
+func (st *appState) reindexMediaFiles() ([]mediaFile, error) {
+	scanStart := time.Now().UnixMilli()
+	files, err := scanMediaFiles(st.cfg.mediaRoot)
+	if err != nil {
+		return nil, err
+	}
+	if err := st.store.ReplaceMediaFiles(files, scanStart); err != nil {
+		return nil, err
+	}
+	return files, nil
+}
+
+// userMediaPaths lists a user's indexed image paths in path order, building
+// the index on first use.
+func (st *appState) userMediaPaths(username string) ([]string, error) {
+	paths, err := st.store.ListMediaPathsForUser(username)
+	if err != nil || len(paths) > 0 {
+		return paths, err
+	}
+	if count, err := st.store.CountMediaFiles(); err != nil || count > 0 {
+		return paths, err
+	}
+	if _, err := st.reindexMediaFiles(); err != nil {
+		return nil, err
+	}
+	return st.store.ListMediaPathsForUser(username)
+}
+
+// indexedMediaFiles lists indexed images newest first, building the index on first use.
+func (st *appState) indexedMediaFiles() ([]mediaFile, error) {
+	files, err := st.store.ListMediaFiles()
+	if err != nil {
+		return nil, err
+	}
+	if len(files) > 0 {
+		return files, nil
+	}
+	files, err = st.reindexMediaFiles()
+	if err != nil {
+		return nil, err
+	}
+	sort.Slice(files, func(i, j int) bool { return files[i].MTime > files[j].MTime })
+	return files, nil
+}
+
+var imageExts = map[string]struct{}{
+	".jpg":  {},
+	".jpeg": {},
+	".png":  {},
+	".webp": {},
+	".gif":  {},
+}
+
 func isImageFile(name string) bool {
-	lower := strings.ToLower(name)
-	return strings.HasSuffix(lower, ".jpg") || strings.HasSuffix(lower, ".jpeg") || strings.HasSuffix(lower, ".png") || strings.HasSuffix(lower, ".webp") || strings.HasSuffix(lower, ".gif")
+	ext := filepath.Ext(name)
+	if _, ok := imageExts[ext]; ok {
+		return true
+	}
+	// Only lowercase the extension, and only when the common lowercase lookup misses.
+	_, ok := imageExts[strings.ToLower(ext)]
+	return ok
+}
+
+var hashBufPool = sync.Pool{
+	New: func() any {
+		buf := make([]byte, 1<<20)
+		return &buf
+	},
+}
+
+// contentHashAlgo names the digest used for image dedup keys. MD5 was only ever
+// a fingerprint here, so a fast non-cryptographic hash is sufficient.
+const contentHashAlgo = "xxh64"
+
+func newContentHasher() *xxhash.Digest {
+	return xxhash.New()
+}
+
+// parseContentHash unpacks a hex content hash into its 64-bit digest. It
+// reports false for strings produced by any other algorithm, such as MD5.
+func parseContentHash(h string) (uint64, bool) {
+	if len(h) != 16 {
+		return 0, false
+	}
+	digest, err := strconv.ParseUint(h, 16, 64)
+	if err != nil {
+		return 0, false
+	}
+	return digest, true
+}
+
+// contentDigest renders a finished hasher as the stored content hash.
+func contentDigest(h *xxhash.Digest) string {
+	return formatContentHash(h.Sum64())
+}
+
+func formatContentHash(digest uint64) string {
+	var b [8]byte
+	binary.BigEndian.PutUint64(b[:], digest)
+	return hex.EncodeToString(b[:])
 }
 
-func fileMD5(path string) (string, error) {
+func fileContentHash(path string) (string, error) {
 	f, err := os.Open(path)
 	if err != nil {
 		return "", err
 	}
 	defer f.Close()
-	h := md5.New()
-	if _, err := io.Copy(h, f); err != nil {
+	buf := hashBufPool.Get().(*[]byte)
+	defer hashBufPool.Put(buf)
+	h := newContentHasher()
+	// Hide WriterTo so CopyBuffer reads through the pooled buffer.
+	if _, err := io.CopyBuffer(h, struct{ io.Reader }{f}, *buf); err != nil {
 		return "", err
 	}
-	return hex.EncodeToString(h.Sum(nil)), nil
+	return contentDigest(h), nil
+}
+
+// cachedFileHash returns the content hash of full, a path found by walking
+// mediaRoot, reusing the value stored in file_hashes while the file's size and
+// mtime are unchanged.
+func (st *appState) cachedFileHash(full string) (string, error) {
+	return st.cachedFileHashAt(full, st.relMediaPath(full))
+}
+
+// cachedFileHashAt is cachedFileHash for callers that already know the
+// file's path relative to mediaRoot, such as one from resolvePathUnderRoot.
+func (st *appState) cachedFileHashAt(full, rel string) (string, error) {
+	info, err := os.Stat(full)
+	if err != nil {
+		return "", err
+	}
+	size := info.Size()
+	mtime := info.ModTime().UnixNano()
+	if hash, ok, err := st.store.GetFileHash(rel, size, mtime); err == nil && ok {
+		return hash, nil
+	}
+	hash, err := fileContentHash(full)
+	if err != nil {
+		return "", err
+	}
+	if err := st.store.PutFileHash(rel, size, mtime, hash); err != nil {
+		logger.Warn("failed to cache file hash", "filepath", rel, "error", err)
+	}
+	return hash, nil
+}
+
+type fileHashResult struct {
+	path string
+	hash string
+	err  error
+}
+
+// hashWorkerCount sizes the hash pool from HASH_WORKERS, or from the CPU
+// count clamped to 2..8 so a spinning disk is not flooded with seeks.
+func (st *appState) hashWorkerCount() int {
+	if st.cfg.hashWorkers > 0 {
+		return st.cfg.hashWorkers
+	}
+	workerCount := runtime.NumCPU()
+	if workerCount < 2 {
+		workerCount = 2
+	}
+	if workerCount > 8 {
+		workerCount = 8
+	}
+	return workerCount
+}
+
+// hashFilesParallel hashes files on a bounded worker pool and streams results
+// in completion order. The returned channel is closed once every file is done.
+func hashFilesParallel(files []string, workerCount int, hashFn func(string) (string, error)) <-chan fileHashResult {
+	jobs := make(chan string, workerCount*2)
+	results := make(chan fileHashResult, workerCount*2)
+
+	var wg sync.WaitGroup
+	wg.Add(workerCount)
+	for i := 0; i < workerCount; i++ {
+		go func() {
+			defer wg.Done()
+			for full := range jobs {
+				hash, err := hashFn(full)
+				results <- fileHashResult{path: full, hash: hash, err: err}
+			}
+		}()
+	}
+
+	go func() {
+		for _, full := range files {
+			jobs <- full
+		}
+		close(jobs)
+		wg.Wait()
+		close(results)
+	}()
+	return results
+}
+
+var contentTypeExts = map[string]string{
+	"image/jpeg": ".jpg",
+	"image/jpg":  ".jpg",
+	"image/png":  ".png",
+	"image/webp": ".webp",
+	"image/gif":  ".gif",
 }
 
 func extFromContentType(contentType string) string {
+	mediaType, _, _ := strings.Cut(contentType, ";")
+	if ext, ok := contentTypeExts[strings.TrimSpace(mediaType)]; ok {
+		return ext
+	}
+	// Fall back to substring matching for unusual or mixed-case types.
 	ct := strings.ToLower(contentType)
 	switch {
 	case strings.Contains(ct, "png"):
@@ -486,6 +813,32 @@ func extFromContentType(contentType string) string {
 	}
 }
 
+// walkPrefix returns the prefix that filepath.WalkDir(root) puts on every path
+// below root, so relative paths can be sliced off without filepath.Rel.
+func walkPrefix(root string) string {
+	prefix := filepath.Clean(root)
+	if prefix == "." {
+		return ""
+	}
+	if !strings.HasSuffix(prefix, string(os.PathSeparator)) {
+		prefix += string(os.PathSeparator)
+	}
+	return prefix
+}
+
+func trimWalkPrefix(root, prefix, target string) string {
+	if rel, ok := strings.CutPrefix(target, prefix); ok {
+		return filepath.ToSlash(rel)
+	}
+	return normalizeRelPath(root, target)
+}
+
+// relMediaPath converts a path found by walking the media root into its
+// slash-separated form relative to the root.
+func (st *appState) relMediaPath(full string) string {
+	return trimWalkPrefix(st.cfg.mediaRoot, st.mediaPrefix, full)
+}
+
 func normalizeRelPath(root, target string) string {
 	rel, err := filepath.Rel(root, target)
 	if err != nil {
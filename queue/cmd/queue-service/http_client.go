@@ -1,13 +1,21 @@
 package main
 
 import (
+	"io"
 	"net"
 	"net/http"
 	"time"
 )
 
 func newSharedHTTPClient(timeout time.Duration) *http.Client {
-	transport := &http.Transport{
+	return &http.Client{
+		Timeout:   timeout,
+		Transport: newSharedTransport(),
+	}
+}
+
+func newSharedTransport() *http.Transport {
+	return &http.Transport{
 		Proxy: http.ProxyFromEnvironment,
 		DialContext: (&net.Dialer{
 			Timeout:   10 * time.Second,
@@ -20,9 +28,61 @@ func newSharedHTTPClient(timeout time.Duration) *http.Client {
 		TLSHandshakeTimeout:   10 * time.Second,
 		ExpectContinueTimeout: 1 * time.Second,
 	}
+}
 
+// newFetchHTTPClient is the client for X/Twitter fetches: it sends the browser
+// User-Agent by default and retries idempotent requests on transient failures.
+func newFetchHTTPClient(timeout time.Duration) *http.Client {
 	return &http.Client{
-		Timeout:   timeout,
-		Transport: transport,
+		Timeout: timeout,
+		Transport: &fetchTransport{
+			base:       newSharedTransport(),
+			userAgent:  "Mozilla/5.0",
+			maxRetries: 3,
+			backoff:    300 * time.Millisecond,
+		},
+	}
+}
+
+type fetchTransport struct {
+	base       http.RoundTripper
+	userAgent  string
+	maxRetries int
+	backoff    time.Duration
+}
+
+func (t *fetchTransport) RoundTrip(req *http.Request) (*http.Response, error) {
+	if req.Header.Get("User-Agent") == "" {
+		req = req.Clone(req.Context())
+		req.Header.Set("User-Agent", t.userAgent)
+	}
+	retryable := (req.Method == http.MethodGet || req.Method == http.MethodHead) && req.Body == nil
+	backoff := t.backoff
+	for attempt := 0; ; attempt++ {
+		resp, err := t.base.RoundTrip(req)
+		if !retryable || attempt >= t.maxRetries || !isTransientFetchFailure(resp, err) {
+			return resp, err
+		}
+		if resp != nil {
+			_, _ = io.Copy(io.Discard, io.LimitReader(resp.Body, 64<<10))
+			resp.Body.Close()
+		}
+		select {
+		case <-req.Context().Done():
+			return nil, req.Context().Err()
+		case <-time.After(backoff):
+		}
+		backoff *= 2
+	}
+}
+
+func isTransientFetchFailure(resp *http.Response, err error) bool {
+	if err != nil {
+		return true
+	}
+	switch resp.StatusCode {
+	case http.StatusBadGateway, http.StatusServiceUnavailable, http.StatusGatewayTimeout:
+		return true
 	}
+	return false
 }
@@ -18,6 +18,7 @@ type RedisClient interface {
 	RPush(ctx context.Context, key string, values ...interface{}) *redis.IntCmd
 	HGet(ctx context.Context, key, field string) *redis.StringCmd
 	HSet(ctx context.Context, key string, values ...interface{}) *redis.IntCmd
+	Pipelined(ctx context.Context, fn func(redis.Pipeliner) error) ([]redis.Cmder, error)
 	Close() error
 }
 
@@ -38,19 +39,46 @@ type TagStore interface {
 	Close() error
 	IsImageProcessed(hash string) (bool, error)
 	MarkImageProcessed(hash string) error
+	MarkImagesProcessed(hashes []string) (int, error)
+	CountProcessedImages() (int, error)
+	GetFileHash(filepath string, size, mtime int64) (string, bool, error)
+	PutFileHash(filepath string, size, mtime int64, hash string) error
+	GetAllFileHashPaths() ([]string, error)
+	DeleteFileHashes(filepaths []string) (int, error)
+	GetRemoteImage(url string) (remoteImage, bool, error)
+	PutRemoteImage(url string, remote remoteImage) error
+	PruneRemoteImages() (int, error)
+	UpsertMediaFile(filepath string, mtime int64) error
+	ReplaceMediaFiles(files []mediaFile, scanStart int64) error
+	ListMediaFiles() ([]mediaFile, error)
+	ListMediaFilesPage(offset, limit int) ([]mediaFile, error)
+	ListMediaPathsForUser(username string) ([]string, error)
+	CountMediaFiles() (int, error)
+	RandomMediaFiles(limit int) ([]mediaFile, error)
+	GetMediaFiles(filepaths []string) ([]mediaFile, error)
+	DeleteMediaFiles(filepaths []string) error
+	DeleteMediaFilesForUser(username string) error
+	PutImagePHash(filepath string, phash uint64) error
+	FindSimilarImages(phash uint64, maxDistance int) ([]string, error)
 	AddTags(filepath string, tags map[string]float64) error
+	AddTagsBulk(tagsByFile map[string]map[string]float64) error
 	DeleteAllTags() error
 	ClearProcessedImages() error
 	GetAllTaggedFilepaths() (map[string]struct{}, error)
 	GetAllProcessedHashes() ([]string, error)
 	DeleteProcessedHashes(hashes []string) (int, error)
 	GetTagsForFiles(filepaths []string) (map[string][]imageTag, error)
-	GetAllTags() ([]map[string]any, error)
+	GetAllTags() ([]tagCount, error)
 	FindFilesByTagPatterns(tags []string) ([]string, error)
+	FindMediaFilesByTagPatterns(tags []string) ([]mediaFile, error)
+	FindMediaFilesByTagPatternsPage(tags []string, offset, limit int) ([]mediaFile, error)
+	CountMediaFilesByTagPatterns(tags []string) (int, error)
 	FindFilesByExactTag(tag string) ([]string, error)
 	DeleteTag(tag string) (int, error)
 	DeleteTagsForFile(filepathVal string) error
+	DeleteTagsForFiles(filepaths []string) error
 	DeleteTagsForUser(username string) error
+	Checkpoint() error
 }
 
 var _ RedisClient = (*redis.Client)(nil)
@@ -48,11 +48,18 @@ func loadConfig() config {
 		redisDB:          envInt("REDIS_DB", 0),
 		queueName:        envOrDefault("ASYNQ_QUEUE", "default"),
 		interactiveQueue: envOrDefault("ASYNQ_INTERACTIVE_QUEUE", "interactive"),
+		autotagQueue:     envOrDefault("ASYNQ_AUTOTAG_QUEUE", "autotag"),
+		workerQueues:     splitCSV(os.Getenv("WORKER_QUEUES")),
 		mediaRoot:        envOrDefault("MEDIA_ROOT", "/app/downloaded_images"),
 		dbPath:           envOrDefault("TAGS_DB_PATH", "/app/tags.db"),
 		autotaggerURL:    os.Getenv("AUTOTAGGER_URL"),
 		autotaggerEnable: strings.EqualFold(envOrDefault("AUTOTAGGER", "false"), "true"),
 		concurrency:      envInt("ASYNQ_CONCURRENCY", 20),
+		downloadConns:    envInt("DOWNLOAD_MAX_CONNS", 20),
+		autotagConns:     envInt("AUTOTAG_MAX_CONNS", 4),
+		hashWorkers:      envInt("HASH_WORKERS", 0),
+		phashDedup:       strings.EqualFold(envOrDefault("PHASH_DEDUP", "false"), "true"),
+		phashMaxDistance: envInt("PHASH_MAX_DISTANCE", 6),
 		apiAddr:          envOrDefault("QUEUE_API_ADDR", ":8001"),
 	}
 }
@@ -75,15 +82,29 @@ func newAppState(cfg config) (*appState, error) {
 		return nil, err
 	}
 
+	downloadConns := cfg.downloadConns
+	if downloadConns < 1 {
+		downloadConns = 1
+	}
+	autotagConns := cfg.autotagConns
+	if autotagConns < 1 {
+		autotagConns = 1
+	}
+
 	redisOpt := asynq.RedisClientOpt{Addr: cfg.redisAddr, Password: cfg.redisPassword, DB: cfg.redisDB}
 	return &appState{
 		cfg:                cfg,
+		mediaPrefix:        walkPrefix(cfg.mediaRoot),
 		redis:              rdb,
 		asynqCli:           asynq.NewClient(redisOpt),
 		store:              store,
 		inspector:          asynq.NewInspector(redisOpt),
-		downloadHTTPClient: newSharedHTTPClient(30 * time.Second),
+		tweetHTTPClient:    newFetchHTTPClient(10 * time.Second),
+		downloadHTTPClient: newFetchHTTPClient(30 * time.Second),
+		downloadSlots:      make(chan struct{}, downloadConns),
+		userCounts:         newDirCountCache(),
 		autotagHTTPClient:  newSharedHTTPClient(60 * time.Second),
+		autotagSlots:       make(chan struct{}, autotagConns),
 	}, nil
 }
 
@@ -115,14 +136,16 @@ func runAPI(st *appState) {
 }
 
 func runWorker(st *appState) {
+	queues := st.workerQueueWeights()
+	if len(queues) == 0 {
+		logger.Error("WORKER_QUEUES selects no known queue", "worker_queues", st.cfg.workerQueues)
+		os.Exit(1)
+	}
 	srv := asynq.NewServer(
 		asynq.RedisClientOpt{Addr: st.cfg.redisAddr, Password: st.cfg.redisPassword, DB: st.cfg.redisDB},
 		asynq.Config{
 			Concurrency: st.cfg.concurrency,
-			Queues: map[string]int{
-				st.cfg.interactiveQueue: 4,
-				st.cfg.queueName:        8,
-			},
+			Queues:      queues,
 		},
 	)
 
@@ -136,10 +159,20 @@ func runWorker(st *appState) {
 	mux.HandleFunc(taskTypeDeleteImages, st.processDeleteImagesTask)
 	mux.HandleFunc(taskTypeRetagImage, st.processRetagImageTask)
 	mux.HandleFunc(taskTypeRetagImages, st.processRetagImagesTask)
+	mux.HandleFunc(taskTypeAutotagFile, st.processAutotagFileTask)
+
+	st.enqueueHashIndexBackfill(context.Background())
+	go func() {
+		if n := removeStaleDownloads(st.cfg.mediaRoot); n > 0 {
+			logger.Info("removed stale download temp files", "count", n)
+		}
+	}()
 
 	logger.Info("queue worker started",
 		"queue", st.cfg.queueName,
 		"interactive_queue", st.cfg.interactiveQueue,
+		"autotag_queue", st.cfg.autotagQueue,
+		"serving", queues,
 		"concurrency", st.cfg.concurrency,
 	)
 	if err := srv.Run(mux); err != nil {
@@ -147,3 +180,27 @@ func runWorker(st *appState) {
 		os.Exit(1)
 	}
 }
+
+// workerQueueWeights returns the queues this worker serves with their
+// priorities. WORKER_QUEUES narrows the default of all three, e.g. to run a
+// separate worker that only drains the autotag queue.
+func (st *appState) workerQueueWeights() map[string]int {
+	all := map[string]int{
+		st.cfg.interactiveQueue: 4,
+		st.cfg.queueName:        8,
+		st.cfg.autotagQueue:     4,
+	}
+	if len(st.cfg.workerQueues) == 0 {
+		return all
+	}
+	queues := make(map[string]int, len(st.cfg.workerQueues))
+	for _, name := range st.cfg.workerQueues {
+		weight, ok := all[name]
+		if !ok {
+			logger.Warn("ignoring unknown queue in WORKER_QUEUES", "queue", name)
+			continue
+		}
+		queues[name] = weight
+	}
+	return queues
+}
@@ -0,0 +1,90 @@
+package main
+
+import (
+	"bufio"
+	"errors"
+	"image"
+	_ "image/gif"
+	_ "image/jpeg"
+	_ "image/png"
+	"io"
+	"math/bits"
+)
+
+// maxPHashPixels bounds the images imageDHash decodes; a full decode holds
+// every pixel in memory, so larger images are not perceptually deduplicated.
+const maxPHashPixels = 32 << 20
+
+// imageDHash computes a 64-bit difference hash: the image is reduced to a 9x8
+// grayscale grid and each bit records whether a cell is brighter than its right
+// neighbour. Re-encoded or resized copies of an image land within a few bits.
+func imageDHash(r io.ReadSeeker) (uint64, error) {
+	cfg, _, err := image.DecodeConfig(bufio.NewReader(r))
+	if err != nil {
+		return 0, err
+	}
+	if int64(cfg.Width)*int64(cfg.Height) > maxPHashPixels {
+		return 0, errors.New("image too large for perceptual hash")
+	}
+	if _, err := r.Seek(0, io.SeekStart); err != nil {
+		return 0, err
+	}
+	img, _, err := image.Decode(bufio.NewReader(r))
+	if err != nil {
+		return 0, err
+	}
+	b := img.Bounds()
+	w, h := b.Dx(), b.Dy()
+	if w < 9 || h < 8 {
+		return 0, errors.New("image too small for perceptual hash")
+	}
+
+	var grid [8][9]float64
+	for gy := 0; gy < 8; gy++ {
+		y0, y1 := b.Min.Y+gy*h/8, b.Min.Y+(gy+1)*h/8
+		for gx := 0; gx < 9; gx++ {
+			x0, x1 := b.Min.X+gx*w/9, b.Min.X+(gx+1)*w/9
+			grid[gy][gx] = meanLuma(img, x0, y0, x1, y1)
+		}
+	}
+
+	var hash uint64
+	for gy := 0; gy < 8; gy++ {
+		for gx := 0; gx < 8; gx++ {
+			hash <<= 1
+			if grid[gy][gx] > grid[gy][gx+1] {
+				hash |= 1
+			}
+		}
+	}
+	return hash, nil
+}
+
+// meanLuma averages luminance over a cell, sampling at most 16x16 pixels.
+func meanLuma(img image.Image, x0, y0, x1, y1 int) float64 {
+	stepX := (x1 - x0) / 16
+	if stepX < 1 {
+		stepX = 1
+	}
+	stepY := (y1 - y0) / 16
+	if stepY < 1 {
+		stepY = 1
+	}
+	var sum float64
+	n := 0
+	for y := y0; y < y1; y += stepY {
+		for x := x0; x < x1; x += stepX {
+			r, g, b, _ := img.At(x, y).RGBA()
+			sum += 0.299*float64(r) + 0.587*float64(g) + 0.114*float64(b)
+			n++
+		}
+	}
+	if n == 0 {
+		return 0
+	}
+	return sum / float64(n)
+}
+
+func hammingDistance(a, b uint64) int {
+	return bits.OnesCount64(a ^ b)
+}
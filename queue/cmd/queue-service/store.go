@@ -23,7 +23,11 @@ func openStore(path string) (*store, error) {
 	}
 	_ = f.Close()
 
-	db, err := sql.Open("sqlite", path)
+	// _txlock=immediate makes every db.Begin a BEGIN IMMEDIATE: write
+	// transactions take the write lock up front, waiting out busy_timeout,
+	// instead of failing with SQLITE_BUSY on a lazy read-to-write upgrade
+	// while the API and worker processes write concurrently.
+	db, err := sql.Open("sqlite", sqliteDSN(path)+"?_txlock=immediate")
 	if err != nil {
 		return nil, fmt.Errorf("sql open failed for %s: %w", path, err)
 	}
@@ -37,6 +41,27 @@ func openStore(path string) (*store, error) {
 	if _, err := db.Exec(`PRAGMA busy_timeout=5000;`); err != nil {
 		return nil, fmt.Errorf("set busy timeout failed for %s: %w", path, err)
 	}
+	// WAL makes NORMAL durable across application crashes; only an OS crash
+	// can lose the last transactions, which a later reconcile rebuilds.
+	if _, err := db.Exec(`PRAGMA synchronous=NORMAL;`); err != nil {
+		return nil, fmt.Errorf("set synchronous failed for %s: %w", path, err)
+	}
+	if _, err := db.Exec(`PRAGMA mmap_size=268435456;`); err != nil {
+		return nil, fmt.Errorf("set mmap size failed for %s: %w", path, err)
+	}
+	// 64 MiB page cache (negative means KiB) and in-memory temp B-trees for
+	// the GROUP BY / ORDER BY sorts behind tag searches and listings.
+	if _, err := db.Exec(`PRAGMA cache_size=-65536;`); err != nil {
+		return nil, fmt.Errorf("set cache size failed for %s: %w", path, err)
+	}
+	if _, err := db.Exec(`PRAGMA temp_store=MEMORY;`); err != nil {
+		return nil, fmt.Errorf("set temp store failed for %s: %w", path, err)
+	}
+	// Let the WAL grow to ~40 MiB before a commit pays for an automatic
+	// checkpoint; bulk jobs call Checkpoint when they finish instead.
+	if _, err := db.Exec(`PRAGMA wal_autocheckpoint=10000;`); err != nil {
+		return nil, fmt.Errorf("set wal autocheckpoint failed for %s: %w", path, err)
+	}
 	if _, err := db.Exec(`
 		CREATE TABLE IF NOT EXISTS image_tags (
 			id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -50,83 +75,878 @@ func openStore(path string) (*store, error) {
 	}
 	if _, err := db.Exec(`
 		CREATE TABLE IF NOT EXISTS processed_images (
-			image_hash TEXT PRIMARY KEY
+			image_hash TEXT PRIMARY KEY,
+			algo TEXT NOT NULL DEFAULT 'md5'
+		);
+	`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`DROP TABLE IF EXISTS processed_images_epoch;`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`
+		CREATE TABLE IF NOT EXISTS file_hashes (
+			filepath TEXT PRIMARY KEY,
+			size INTEGER NOT NULL,
+			mtime INTEGER NOT NULL,
+			image_hash TEXT NOT NULL,
+			algo TEXT NOT NULL DEFAULT 'md5'
 		);
 	`); err != nil {
 		return nil, err
 	}
+	if _, err := db.Exec(`
+		CREATE TABLE IF NOT EXISTS media_files (
+			filepath TEXT PRIMARY KEY,
+			mtime INTEGER NOT NULL
+		);
+	`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`
+		CREATE TABLE IF NOT EXISTS image_phashes (
+			filepath TEXT PRIMARY KEY,
+			phash INTEGER NOT NULL,
+			band0 INTEGER,
+			band1 INTEGER,
+			band2 INTEGER,
+			band3 INTEGER
+		);
+	`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`
+		CREATE TABLE IF NOT EXISTS remote_images (
+			url TEXT PRIMARY KEY,
+			etag TEXT NOT NULL,
+			last_modified TEXT NOT NULL,
+			image_hash TEXT NOT NULL
+		);
+	`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`CREATE INDEX IF NOT EXISTS idx_media_files_mtime ON media_files(mtime);`); err != nil {
+		return nil, err
+	}
+	if err := ensureColumn(db, "file_hashes", "algo", `TEXT NOT NULL DEFAULT 'md5'`); err != nil {
+		return nil, err
+	}
+	if err := ensureColumn(db, "processed_images", "algo", `TEXT NOT NULL DEFAULT 'md5'`); err != nil {
+		return nil, err
+	}
 	if _, err := db.Exec(`CREATE INDEX IF NOT EXISTS idx_image_tags_filepath ON image_tags(filepath);`); err != nil {
 		return nil, err
 	}
 	if _, err := db.Exec(`CREATE INDEX IF NOT EXISTS idx_image_tags_tag ON image_tags(tag);`); err != nil {
 		return nil, err
 	}
-	if _, err := db.Exec(`CREATE INDEX IF NOT EXISTS idx_image_tags_lower_tag ON image_tags(LOWER(tag));`); err != nil {
+	// Exact-tag lookups seek on LOWER(tag) and read filepaths already in
+	// order, so SELECT DISTINCT filepath needs no temp B-tree. This replaces
+	// the LOWER(tag)-only index.
+	if _, err := db.Exec(`CREATE INDEX IF NOT EXISTS idx_image_tags_lower_tag_filepath ON image_tags(LOWER(tag), filepath);`); err != nil {
+		return nil, err
+	}
+	if _, err := db.Exec(`DROP INDEX IF EXISTS idx_image_tags_lower_tag;`); err != nil {
+		return nil, err
+	}
+	if err := ensureTagCounts(db); err != nil {
+		return nil, err
+	}
+	if err := ensurePHashBands(db); err != nil {
+		return nil, err
+	}
+	// IsImageProcessed runs once per downloaded image and GetFileHash once
+	// per file in every hash sweep; prepare them once instead of per call.
+	processedStmt, err := db.Prepare(
+		`SELECT EXISTS(SELECT 1 FROM processed_images WHERE image_hash = ? AND algo = ?)`,
+	)
+	if err != nil {
+		return nil, err
+	}
+	fileHashStmt, err := db.Prepare(
+		`SELECT image_hash FROM file_hashes WHERE filepath = ? AND size = ? AND mtime = ? AND algo = ?`,
+	)
+	if err != nil {
+		_ = processedStmt.Close()
+		return nil, err
+	}
+	return &store{db: db, processedStmt: processedStmt, fileHashStmt: fileHashStmt}, nil
+}
+
+// ensureTagCounts maintains tag_counts, the per-tag row counts of
+// image_tags, through triggers so GetAllTags reads one row per distinct tag
+// instead of aggregating every tag row. A pre-existing image_tags is counted
+// once, in the same transaction that creates the table.
+func ensureTagCounts(db *sql.DB) error {
+	return withSQLiteRetry(func() error {
+		tx, err := db.Begin()
+		if err != nil {
+			return err
+		}
+		defer tx.Rollback()
+
+		var exists bool
+		if err := tx.QueryRow(
+			`SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tag_counts')`,
+		).Scan(&exists); err != nil {
+			return err
+		}
+		if _, err := tx.Exec(`
+			CREATE TABLE IF NOT EXISTS tag_counts (
+				tag TEXT PRIMARY KEY,
+				cnt INTEGER NOT NULL
+			)
+		`); err != nil {
+			return err
+		}
+		if err := createTagCountTriggers(tx); err != nil {
+			return err
+		}
+		if !exists {
+			if _, err := tx.Exec(`INSERT INTO tag_counts (tag, cnt) SELECT tag, COUNT(*) FROM image_tags GROUP BY tag`); err != nil {
+				return err
+			}
+		}
+		return tx.Commit()
+	})
+}
+
+// phashBandCount splits each 64-bit perceptual hash into 16-bit bands stored
+// in indexed columns band0..band3. Hashes within d bits of each other agree
+// to within d/phashBandCount bits in at least one band, so FindSimilarImages
+// seeks on band neighbours instead of scanning every hash.
+const phashBandCount = 4
+
+func phashBand(phash uint64, i int) int64 {
+	return int64(phash >> (16 * (phashBandCount - 1 - i)) & 0xFFFF)
+}
+
+// ensurePHashBands adds and indexes the band columns, then fills them for
+// rows written before they existed.
+func ensurePHashBands(db *sql.DB) error {
+	for i := 0; i < phashBandCount; i++ {
+		if err := ensureColumn(db, "image_phashes", fmt.Sprintf("band%d", i), "INTEGER"); err != nil {
+			return err
+		}
+		if _, err := db.Exec(fmt.Sprintf(`CREATE INDEX IF NOT EXISTS idx_image_phashes_band%d ON image_phashes(band%d);`, i, i)); err != nil {
+			return err
+		}
+	}
+	return withSQLiteRetry(func() error {
+		_, err := db.Exec(`
+			UPDATE image_phashes SET
+				band0 = (phash >> 48) & 65535,
+				band1 = (phash >> 32) & 65535,
+				band2 = (phash >> 16) & 65535,
+				band3 = phash & 65535
+			WHERE band0 IS NULL
+		`)
+		return err
+	})
+}
+
+var tagCountTriggers = []string{
+	`CREATE TRIGGER IF NOT EXISTS trg_image_tags_count_insert AFTER INSERT ON image_tags
+	BEGIN
+		INSERT INTO tag_counts (tag, cnt) VALUES (NEW.tag, 1)
+		ON CONFLICT(tag) DO UPDATE SET cnt = cnt + 1;
+	END`,
+	`CREATE TRIGGER IF NOT EXISTS trg_image_tags_count_delete AFTER DELETE ON image_tags
+	BEGIN
+		UPDATE tag_counts SET cnt = cnt - 1 WHERE tag = OLD.tag;
+		DELETE FROM tag_counts WHERE tag = OLD.tag AND cnt <= 0;
+	END`,
+}
+
+func createTagCountTriggers(tx *sql.Tx) error {
+	for _, stmt := range tagCountTriggers {
+		if _, err := tx.Exec(stmt); err != nil {
+			return err
+		}
+	}
+	return nil
+}
+
+// ensureColumn adds column to a table created by an older version. The API and
+// worker processes migrate the same file at startup, so losing the race to
+// the other process's ALTER counts as success.
+func ensureColumn(db *sql.DB, table, column, decl string) error {
+	rows, err := db.Query(fmt.Sprintf("PRAGMA table_info(%s)", table))
+	if err != nil {
+		return err
+	}
+	defer rows.Close()
+	for rows.Next() {
+		var (
+			cid       int
+			name      string
+			colType   string
+			notNull   int
+			dfltValue sql.NullString
+			pk        int
+		)
+		if err := rows.Scan(&cid, &name, &colType, &notNull, &dfltValue, &pk); err != nil {
+			return err
+		}
+		if name == column {
+			return nil
+		}
+	}
+	if err := rows.Err(); err != nil {
+		return err
+	}
+	_, err = db.Exec(fmt.Sprintf("ALTER TABLE %s ADD COLUMN %s %s", table, column, decl))
+	if err != nil && strings.Contains(strings.ToLower(err.Error()), "duplicate column name") {
+		return nil
+	}
+	return err
+}
+
+func isRetryableSQLiteError(err error) bool {
+	if err == nil {
+		return false
+	}
+	msg := strings.ToLower(err.Error())
+	return strings.Contains(msg, "database is locked") ||
+		strings.Contains(msg, "database is busy") ||
+		strings.Contains(msg, "sqlite_busy") ||
+		strings.Contains(msg, "unable to open database file")
+}
+
+func withSQLiteRetry(op func() error) error {
+	var err error
+	backoff := 50 * time.Millisecond
+	for i := 0; i < 4; i++ {
+		err = op()
+		if err == nil {
+			return nil
+		}
+		if !isRetryableSQLiteError(err) {
+			return err
+		}
+		time.Sleep(backoff)
+		backoff *= 2
+	}
+	return err
+}
+
+// Checkpoint copies the WAL back into the database file and truncates it.
+// Bulk jobs call it once they finish, so the cost lands at a quiet point
+// rather than on whichever commit crosses the autocheckpoint threshold.
+func (s *store) Checkpoint() error {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		_, err := s.db.Exec(`PRAGMA wal_checkpoint(TRUNCATE)`)
+		return err
+	})
+}
+
+// sqliteDSN turns a filesystem path into a file: URI so connection
+// parameters can be appended.
+func sqliteDSN(path string) string {
+	return "file:" + strings.NewReplacer("%", "%25", "?", "%3F", "#", "%23").Replace(path)
+}
+
+func (s *store) Close() error {
+	_ = s.processedStmt.Close()
+	_ = s.fileHashStmt.Close()
+	return s.db.Close()
+}
+
+func (s *store) IsImageProcessed(hash string) (bool, error) {
+	var found bool
+	err := withSQLiteRetry(func() error {
+		return s.processedStmt.QueryRow(hash, contentHashAlgo).Scan(&found)
+	})
+	return found, err
+}
+
+func (s *store) MarkImageProcessed(hash string) error {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		_, err := s.db.Exec(
+			`INSERT OR IGNORE INTO processed_images (image_hash, algo) VALUES (?, ?)`,
+			hash, contentHashAlgo,
+		)
+		return err
+	})
+}
+
+// MarkImagesProcessed records many hashes, committing once per 500 and
+// returning how many were newly inserted.
+func (s *store) MarkImagesProcessed(hashes []string) (int, error) {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	inserted := 0
+	const chunkSize = 500
+	for start := 0; start < len(hashes); start += chunkSize {
+		end := start + chunkSize
+		if end > len(hashes) {
+			end = len(hashes)
+		}
+		chunk := hashes[start:end]
+		var chunkInserted int64
+		err := withSQLiteRetry(func() error {
+			chunkInserted = 0
+			tx, err := s.db.Begin()
+			if err != nil {
+				return err
+			}
+			defer tx.Rollback()
+			stmt, err := tx.Prepare(`INSERT OR IGNORE INTO processed_images (image_hash, algo) VALUES (?, ?)`)
+			if err != nil {
+				return err
+			}
+			defer stmt.Close()
+			for _, h := range chunk {
+				res, err := stmt.Exec(h, contentHashAlgo)
+				if err != nil {
+					return err
+				}
+				n, _ := res.RowsAffected()
+				chunkInserted += n
+			}
+			return tx.Commit()
+		})
+		if err != nil {
+			return inserted, err
+		}
+		inserted += int(chunkInserted)
+	}
+	return inserted, nil
+}
+
+// GetFileHash returns the cached content hash for filepath when the recorded
+// size, mtime and hash algorithm still match.
+func (s *store) GetFileHash(filepathVal string, size, mtime int64) (string, bool, error) {
+	var hash string
+	var found bool
+	err := withSQLiteRetry(func() error {
+		err := s.fileHashStmt.QueryRow(filepathVal, size, mtime, contentHashAlgo).Scan(&hash)
+		if errors.Is(err, sql.ErrNoRows) {
+			found = false
+			return nil
+		}
+		if err != nil {
+			return err
+		}
+		found = true
+		return nil
+	})
+	return hash, found, err
+}
+
+func (s *store) PutFileHash(filepathVal string, size, mtime int64, hash string) error {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		_, err := s.db.Exec(
+			`INSERT OR REPLACE INTO file_hashes (filepath, size, mtime, image_hash, algo) VALUES (?, ?, ?, ?, ?)`,
+			filepathVal, size, mtime, hash, contentHashAlgo,
+		)
+		return err
+	})
+}
+
+func (s *store) GetAllFileHashPaths() ([]string, error) {
+	items := make([]string, 0)
+	err := withSQLiteRetry(func() error {
+		rows, err := s.db.Query(`SELECT filepath FROM file_hashes`)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var p string
+			if err := rows.Scan(&p); err != nil {
+				return err
+			}
+			items = append(items, p)
+		}
+		return rows.Err()
+	})
+	return items, err
+}
+
+func (s *store) DeleteFileHashes(filepaths []string) (int, error) {
+	if len(filepaths) == 0 {
+		return 0, nil
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+
+	totalDeleted := 0
+	const chunkSize = 500
+	for start := 0; start < len(filepaths); start += chunkSize {
+		end := start + chunkSize
+		if end > len(filepaths) {
+			end = len(filepaths)
+		}
+		chunk := filepaths[start:end]
+
+		placeholders := strings.TrimRight(strings.Repeat("?,", len(chunk)), ",")
+		query := fmt.Sprintf("DELETE FROM file_hashes WHERE filepath IN (%s)", placeholders)
+		args := make([]any, 0, len(chunk))
+		for _, p := range chunk {
+			args = append(args, p)
+		}
+
+		var deleted int64
+		err := withSQLiteRetry(func() error {
+			res, err := s.db.Exec(query, args...)
+			if err != nil {
+				return err
+			}
+			deleted, _ = res.RowsAffected()
+			return nil
+		})
+		if err != nil {
+			return totalDeleted, err
+		}
+		totalDeleted += int(deleted)
+	}
+	return totalDeleted, nil
+}
+
+func (s *store) GetRemoteImage(url string) (remoteImage, bool, error) {
+	var remote remoteImage
+	var found bool
+	err := withSQLiteRetry(func() error {
+		err := s.db.QueryRow(
+			`SELECT etag, last_modified, image_hash FROM remote_images WHERE url = ?`, url,
+		).Scan(&remote.ETag, &remote.LastModified, &remote.Hash)
+		if errors.Is(err, sql.ErrNoRows) {
+			found = false
+			return nil
+		}
+		if err != nil {
+			return err
+		}
+		found = true
+		return nil
+	})
+	return remote, found, err
+}
+
+func (s *store) PutRemoteImage(url string, remote remoteImage) error {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		_, err := s.db.Exec(
+			`INSERT OR REPLACE INTO remote_images (url, etag, last_modified, image_hash) VALUES (?, ?, ?, ?)`,
+			url, remote.ETag, remote.LastModified, remote.Hash,
+		)
+		return err
+	})
+}
+
+// PruneRemoteImages deletes validators whose content hash is no longer in
+// processed_images; they can never make a request conditional again.
+func (s *store) PruneRemoteImages() (int, error) {
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	var deleted int64
+	err := withSQLiteRetry(func() error {
+		res, err := s.db.Exec(
+			`DELETE FROM remote_images WHERE NOT EXISTS (
+				SELECT 1 FROM processed_images p WHERE p.image_hash = remote_images.image_hash
+			)`,
+		)
+		if err != nil {
+			return err
+		}
+		deleted, _ = res.RowsAffected()
+		return nil
+	})
+	return int(deleted), err
+}
+
+func (s *store) UpsertMediaFile(filepathVal string, mtime int64) error {
+	defer s.invalidateMediaList()
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		_, err := s.db.Exec(`INSERT OR REPLACE INTO media_files (filepath, mtime) VALUES (?, ?)`, filepathVal, mtime)
+		return err
+	})
+}
+
+// ReplaceMediaFiles syncs the media_files index to files, a walk of the media
+// root that began at scanStart (unix ms). Walked rows are upserted and rows
+// missing from the walk are deleted, except those with a newer mtime: those
+// were added by a download that finished while the walk was running.
+func (s *store) ReplaceMediaFiles(files []mediaFile, scanStart int64) error {
+	defer s.invalidateMediaList()
+	walked := make(map[string]struct{}, len(files))
+	for _, f := range files {
+		walked[f.Path] = struct{}{}
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		tx, err := s.db.Begin()
+		if err != nil {
+			return err
+		}
+		defer tx.Rollback()
+		stale, err := staleMediaPaths(tx, walked, scanStart)
+		if err != nil {
+			return err
+		}
+		del, err := tx.Prepare(`DELETE FROM media_files WHERE filepath = ?`)
+		if err != nil {
+			return err
+		}
+		defer del.Close()
+		for _, p := range stale {
+			if _, err := del.Exec(p); err != nil {
+				return err
+			}
+		}
+		stmt, err := tx.Prepare(`INSERT OR REPLACE INTO media_files (filepath, mtime) VALUES (?, ?)`)
+		if err != nil {
+			return err
+		}
+		defer stmt.Close()
+		for _, f := range files {
+			if _, err := stmt.Exec(f.Path, f.MTime); err != nil {
+				return err
+			}
+		}
+		return tx.Commit()
+	})
+}
+
+// staleMediaPaths lists indexed paths older than scanStart that the walk did not find.
+func staleMediaPaths(tx *sql.Tx, walked map[string]struct{}, scanStart int64) ([]string, error) {
+	rows, err := tx.Query(`SELECT filepath FROM media_files WHERE mtime < ?`, scanStart)
+	if err != nil {
 		return nil, err
 	}
-	return &store{db: db}, nil
+	defer rows.Close()
+	var stale []string
+	for rows.Next() {
+		var p string
+		if err := rows.Scan(&p); err != nil {
+			return nil, err
+		}
+		if _, ok := walked[p]; !ok {
+			stale = append(stale, p)
+		}
+	}
+	return stale, rows.Err()
+}
+
+// ListMediaFiles returns the media index newest first. The listing is cached
+// until media_files changes in this process or PRAGMA data_version shows a
+// write from another process; callers get their own copy.
+func (s *store) ListMediaFiles() ([]mediaFile, error) {
+	s.mediaMu.Lock()
+	defer s.mediaMu.Unlock()
+
+	var version int64
+	versionErr := s.db.QueryRow(`PRAGMA data_version`).Scan(&version)
+	if versionErr == nil && s.mediaList != nil && version == s.mediaDataVersion {
+		return append([]mediaFile(nil), s.mediaList...), nil
+	}
+
+	items := make([]mediaFile, 0)
+	err := withSQLiteRetry(func() error {
+		items = items[:0]
+		rows, err := s.db.Query(`SELECT filepath, mtime FROM media_files ORDER BY mtime DESC`)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var f mediaFile
+			if err := rows.Scan(&f.Path, &f.MTime); err != nil {
+				return err
+			}
+			items = append(items, f)
+		}
+		return rows.Err()
+	})
+	if err != nil {
+		return items, err
+	}
+	if versionErr == nil {
+		s.mediaList = items
+		s.mediaDataVersion = version
+		return append([]mediaFile(nil), items...), nil
+	}
+	return items, nil
+}
+
+func (s *store) invalidateMediaList() {
+	s.mediaMu.Lock()
+	defer s.mediaMu.Unlock()
+	s.mediaList = nil
+}
+
+// ListMediaPathsForUser returns the indexed paths under username/ in path
+// order, as a primary-key range scan.
+func (s *store) ListMediaPathsForUser(username string) ([]string, error) {
+	// '0' sorts immediately after '/', so this range is exactly the "username/" prefix.
+	lower, upper := username+"/", username+"0"
+	items := make([]string, 0)
+	err := withSQLiteRetry(func() error {
+		items = items[:0]
+		rows, err := s.db.Query(
+			`SELECT filepath FROM media_files WHERE filepath >= ? AND filepath < ? ORDER BY filepath`,
+			lower, upper,
+		)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var p string
+			if err := rows.Scan(&p); err != nil {
+				return err
+			}
+			items = append(items, p)
+		}
+		return rows.Err()
+	})
+	return items, err
+}
+
+func (s *store) CountMediaFiles() (int, error) {
+	var count int
+	err := withSQLiteRetry(func() error {
+		return s.db.QueryRow(`SELECT COUNT(*) FROM media_files`).Scan(&count)
+	})
+	return count, err
+}
+
+// ListMediaFilesPage returns one page of the media index newest first,
+// walking idx_media_files_mtime instead of loading the whole listing.
+func (s *store) ListMediaFilesPage(offset, limit int) ([]mediaFile, error) {
+	if limit <= 0 {
+		return []mediaFile{}, nil
+	}
+	return s.queryMediaFiles(`SELECT filepath, mtime FROM media_files ORDER BY mtime DESC LIMIT ? OFFSET ?`, limit, offset)
 }
 
-func isRetryableSQLiteError(err error) bool {
-	if err == nil {
-		return false
+func (s *store) RandomMediaFiles(limit int) ([]mediaFile, error) {
+	items := make([]mediaFile, 0, limit)
+	if limit <= 0 {
+		return items, nil
 	}
-	msg := strings.ToLower(err.Error())
-	return strings.Contains(msg, "database is locked") ||
-		strings.Contains(msg, "database is busy") ||
-		strings.Contains(msg, "sqlite_busy") ||
-		strings.Contains(msg, "unable to open database file")
+	err := withSQLiteRetry(func() error {
+		items = items[:0]
+		rows, err := s.db.Query(`SELECT filepath, mtime FROM media_files ORDER BY RANDOM() LIMIT ?`, limit)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var f mediaFile
+			if err := rows.Scan(&f.Path, &f.MTime); err != nil {
+				return err
+			}
+			items = append(items, f)
+		}
+		return rows.Err()
+	})
+	return items, err
 }
 
-func withSQLiteRetry(op func() error) error {
-	var err error
-	backoff := 50 * time.Millisecond
-	for i := 0; i < 4; i++ {
-		err = op()
-		if err == nil {
-			return nil
+func (s *store) GetMediaFiles(filepaths []string) ([]mediaFile, error) {
+	items := make([]mediaFile, 0, len(filepaths))
+	const chunkSize = 500
+	for start := 0; start < len(filepaths); start += chunkSize {
+		end := start + chunkSize
+		if end > len(filepaths) {
+			end = len(filepaths)
 		}
-		if !isRetryableSQLiteError(err) {
-			return err
+		chunk := filepaths[start:end]
+		placeholders := strings.TrimRight(strings.Repeat("?,", len(chunk)), ",")
+		query := fmt.Sprintf("SELECT filepath, mtime FROM media_files WHERE filepath IN (%s)", placeholders)
+		args := make([]any, 0, len(chunk))
+		for _, p := range chunk {
+			args = append(args, p)
 		}
-		time.Sleep(backoff)
-		backoff *= 2
+
+		chunkItems := make([]mediaFile, 0, len(chunk))
+		err := withSQLiteRetry(func() error {
+			chunkItems = chunkItems[:0]
+			rows, err := s.db.Query(query, args...)
+			if err != nil {
+				return err
+			}
+			defer rows.Close()
+			for rows.Next() {
+				var f mediaFile
+				if err := rows.Scan(&f.Path, &f.MTime); err != nil {
+					return err
+				}
+				chunkItems = append(chunkItems, f)
+			}
+			return rows.Err()
+		})
+		if err != nil {
+			return items, err
+		}
+		items = append(items, chunkItems...)
 	}
-	return err
+	return items, nil
 }
 
-func (s *store) Close() error {
-	return s.db.Close()
-}
+func (s *store) DeleteMediaFiles(filepaths []string) error {
+	if len(filepaths) == 0 {
+		return nil
+	}
+	defer s.invalidateMediaList()
+	s.mu.Lock()
+	defer s.mu.Unlock()
 
-func (s *store) IsImageProcessed(hash string) (bool, error) {
-	var found bool
-	err := withSQLiteRetry(func() error {
-		var x int
-		err := s.db.QueryRow(`SELECT 1 FROM processed_images WHERE image_hash = ?`, hash).Scan(&x)
-		if errors.Is(err, sql.ErrNoRows) {
-			found = false
-			return nil
+	const chunkSize = 500
+	for start := 0; start < len(filepaths); start += chunkSize {
+		end := start + chunkSize
+		if end > len(filepaths) {
+			end = len(filepaths)
+		}
+		chunk := filepaths[start:end]
+		placeholders := strings.TrimRight(strings.Repeat("?,", len(chunk)), ",")
+		args := make([]any, 0, len(chunk))
+		for _, p := range chunk {
+			args = append(args, p)
 		}
+		err := withSQLiteRetry(func() error {
+			if _, err := s.db.Exec(fmt.Sprintf("DELETE FROM media_files WHERE filepath IN (%s)", placeholders), args...); err != nil {
+				return err
+			}
+			_, err := s.db.Exec(fmt.Sprintf("DELETE FROM image_phashes WHERE filepath IN (%s)", placeholders), args...)
+			return err
+		})
 		if err != nil {
 			return err
 		}
-		found = true
-		return nil
+	}
+	return nil
+}
+
+func (s *store) DeleteMediaFilesForUser(username string) error {
+	defer s.invalidateMediaList()
+	// Same exact "username/" prefix range as ListMediaPathsForUser; LIKE would
+	// treat "_" as a wildcard and fold ASCII case.
+	lower, upper := username+"/", username+"0"
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		if _, err := s.db.Exec(`DELETE FROM media_files WHERE filepath >= ? AND filepath < ?`, lower, upper); err != nil {
+			return err
+		}
+		_, err := s.db.Exec(`DELETE FROM image_phashes WHERE filepath >= ? AND filepath < ?`, lower, upper)
+		return err
 	})
-	return found, err
 }
 
-func (s *store) MarkImageProcessed(hash string) error {
+func (s *store) PutImagePHash(filepathVal string, phash uint64) error {
 	s.mu.Lock()
 	defer s.mu.Unlock()
 	return withSQLiteRetry(func() error {
-		_, err := s.db.Exec(`INSERT OR IGNORE INTO processed_images (image_hash) VALUES (?)`, hash)
+		_, err := s.db.Exec(
+			`INSERT OR REPLACE INTO image_phashes (filepath, phash, band0, band1, band2, band3) VALUES (?, ?, ?, ?, ?, ?)`,
+			filepathVal, int64(phash), phashBand(phash, 0), phashBand(phash, 1), phashBand(phash, 2), phashBand(phash, 3),
+		)
 		return err
 	})
 }
 
+// FindSimilarImages returns files whose perceptual hash is within maxDistance bits of phash.
+func (s *store) FindSimilarImages(phash uint64, maxDistance int) ([]string, error) {
+	if maxDistance < 0 {
+		return nil, nil
+	}
+	query := `SELECT filepath, phash FROM image_phashes`
+	var args []any
+	// Past 2 bits per band the neighbour lists grow to thousands of values
+	// and a plain scan is cheaper.
+	if radius := maxDistance / phashBandCount; radius <= 2 {
+		terms := make([]string, 0, phashBandCount)
+		for i := 0; i < phashBandCount; i++ {
+			values := bandNeighbours(phashBand(phash, i), radius)
+			terms = append(terms, fmt.Sprintf("band%d IN (%s)", i, strings.TrimRight(strings.Repeat("?,", len(values)), ",")))
+			args = append(args, values...)
+		}
+		query += " WHERE " + strings.Join(terms, " OR ")
+	}
+	items := make([]string, 0)
+	err := withSQLiteRetry(func() error {
+		items = items[:0]
+		rows, err := s.db.Query(query, args...)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var p string
+			var h int64
+			if err := rows.Scan(&p, &h); err != nil {
+				return err
+			}
+			if hammingDistance(phash, uint64(h)) <= maxDistance {
+				items = append(items, p)
+			}
+		}
+		return rows.Err()
+	})
+	return items, err
+}
+
+// bandNeighbours lists every 16-bit value within radius bits of band.
+func bandNeighbours(band int64, radius int) []any {
+	values := []any{band}
+	for i := 0; i < 16 && radius >= 1; i++ {
+		flipped := band ^ 1<<i
+		values = append(values, flipped)
+		for j := i + 1; j < 16 && radius >= 2; j++ {
+			values = append(values, flipped^1<<j)
+		}
+	}
+	return values
+}
+
 func (s *store) AddTags(filepath string, tags map[string]float64) error {
+	if len(tags) == 0 {
+		return nil
+	}
+	return s.AddTagsBulk(map[string]map[string]float64{filepath: tags})
+}
+
+// tagInsertRows caps each multi-row INSERT at 900 bound parameters, under
+// SQLite's default limit of 999.
+const tagInsertRows = 300
+
+// AddTagsBulk stores tags for many files in a single transaction.
+func (s *store) AddTagsBulk(tagsByFile map[string]map[string]float64) error {
+	if len(tagsByFile) == 0 {
+		return nil
+	}
+	args := make([]any, 0, 3*tagInsertRows)
+	var batches [][]any
+	for filepathVal, tags := range tagsByFile {
+		for tag, conf := range tags {
+			args = append(args, filepathVal, tag, conf)
+			if len(args) == cap(args) {
+				batches = append(batches, args)
+				args = make([]any, 0, 3*tagInsertRows)
+			}
+		}
+	}
+	if len(args) > 0 {
+		batches = append(batches, args)
+	}
+	if len(batches) == 0 {
+		return nil
+	}
+
 	s.mu.Lock()
 	defer s.mu.Unlock()
 	return withSQLiteRetry(func() error {
@@ -135,14 +955,28 @@ func (s *store) AddTags(filepath string, tags map[string]float64) error {
 			return err
 		}
 		defer tx.Rollback()
-		stmt, err := tx.Prepare(`INSERT OR IGNORE INTO image_tags (filepath, tag, confidence) VALUES (?, ?, ?)`)
-		if err != nil {
-			return err
-		}
-		defer stmt.Close()
 
-		for tag, conf := range tags {
-			if _, err := stmt.Exec(filepath, tag, conf); err != nil {
+		// One statement per batch instead of one Exec per tag; only the last
+		// batch can differ in size, so at most two statements are prepared.
+		stmts := make(map[int]*sql.Stmt, 2)
+		defer func() {
+			for _, stmt := range stmts {
+				stmt.Close()
+			}
+		}()
+		for _, batch := range batches {
+			n := len(batch) / 3
+			stmt, ok := stmts[n]
+			if !ok {
+				query := `INSERT OR IGNORE INTO image_tags (filepath, tag, confidence) VALUES ` +
+					strings.TrimSuffix(strings.Repeat("(?, ?, ?),", n), ",")
+				stmt, err = tx.Prepare(query)
+				if err != nil {
+					return err
+				}
+				stmts[n] = stmt
+			}
+			if _, err := stmt.Exec(batch...); err != nil {
 				return err
 			}
 		}
@@ -153,9 +987,30 @@ func (s *store) AddTags(filepath string, tags map[string]float64) error {
 func (s *store) DeleteAllTags() error {
 	s.mu.Lock()
 	defer s.mu.Unlock()
+	// With the tag_counts triggers in place every deleted row would fire
+	// them, and SQLite's truncate optimization is disabled. Drop the
+	// triggers for the duration, clear both tables, and recreate them, all
+	// in one transaction.
 	return withSQLiteRetry(func() error {
-		_, err := s.db.Exec(`DELETE FROM image_tags`)
-		return err
+		tx, err := s.db.Begin()
+		if err != nil {
+			return err
+		}
+		defer tx.Rollback()
+		for _, stmt := range []string{
+			`DROP TRIGGER IF EXISTS trg_image_tags_count_insert`,
+			`DROP TRIGGER IF EXISTS trg_image_tags_count_delete`,
+			`DELETE FROM image_tags`,
+			`DELETE FROM tag_counts`,
+		} {
+			if _, err := tx.Exec(stmt); err != nil {
+				return err
+			}
+		}
+		if err := createTagCountTriggers(tx); err != nil {
+			return err
+		}
+		return tx.Commit()
 	})
 }
 
@@ -208,6 +1063,15 @@ func (s *store) GetAllProcessedHashes() ([]string, error) {
 	return items, err
 }
 
+// CountProcessedImages counts dedup hashes recorded with the current algorithm.
+func (s *store) CountProcessedImages() (int, error) {
+	var n int
+	err := withSQLiteRetry(func() error {
+		return s.db.QueryRow(`SELECT COUNT(*) FROM processed_images WHERE algo = ?`, contentHashAlgo).Scan(&n)
+	})
+	return n, err
+}
+
 func (s *store) DeleteProcessedHashes(hashes []string) (int, error) {
 	if len(hashes) == 0 {
 		return 0, nil
@@ -299,26 +1163,20 @@ func (s *store) GetTagsForFiles(filepaths []string) (map[string][]imageTag, erro
 	return result, nil
 }
 
-func (s *store) GetAllTags() ([]map[string]any, error) {
-	items := make([]map[string]any, 0)
+func (s *store) GetAllTags() ([]tagCount, error) {
+	items := make([]tagCount, 0)
 	err := withSQLiteRetry(func() error {
-		rows, err := s.db.Query(`
-			SELECT tag, COUNT(id) as tag_count
-			FROM image_tags
-			GROUP BY tag
-			ORDER BY tag_count DESC, tag ASC
-		`)
+		rows, err := s.db.Query(`SELECT tag, cnt FROM tag_counts ORDER BY cnt DESC, tag ASC`)
 		if err != nil {
 			return err
 		}
 		defer rows.Close()
 		for rows.Next() {
-			var tag string
-			var count int
-			if err := rows.Scan(&tag, &count); err != nil {
+			var item tagCount
+			if err := rows.Scan(&item.Tag, &item.Count); err != nil {
 				return err
 			}
-			items = append(items, map[string]any{"tag": tag, "count": count})
+			items = append(items, item)
 		}
 		return rows.Err()
 	})
@@ -329,16 +1187,10 @@ func (s *store) FindFilesByTagPatterns(tags []string) ([]string, error) {
 	if len(tags) == 0 {
 		return []string{}, nil
 	}
-	query := "SELECT filepath FROM image_tags WHERE LOWER(tag) LIKE ?"
-	for i := 1; i < len(tags); i++ {
-		query += " INTERSECT SELECT filepath FROM image_tags WHERE LOWER(tag) LIKE ?"
-	}
-	args := make([]any, 0, len(tags))
-	for _, tag := range tags {
-		args = append(args, "%"+strings.ToLower(strings.TrimSpace(tag))+"%")
-	}
+	query, args := tagPatternQuery(tags)
 	items := make([]string, 0)
 	err := withSQLiteRetry(func() error {
+		items = items[:0]
 		rows, err := s.db.Query(query, args...)
 		if err != nil {
 			return err
@@ -356,6 +1208,90 @@ func (s *store) FindFilesByTagPatterns(tags []string) ([]string, error) {
 	return items, err
 }
 
+// FindMediaFilesByTagPatterns joins the tag search against media_files so
+// matching images come back with their mtimes, newest first, in one query.
+func (s *store) FindMediaFilesByTagPatterns(tags []string) ([]mediaFile, error) {
+	if len(tags) == 0 {
+		return []mediaFile{}, nil
+	}
+	tagQuery, args := tagPatternQuery(tags)
+	return s.queryMediaFiles("SELECT filepath, mtime FROM media_files WHERE filepath IN ("+tagQuery+") ORDER BY mtime DESC", args...)
+}
+
+// FindMediaFilesByTagPatternsPage is FindMediaFilesByTagPatterns limited to
+// one page in SQL.
+func (s *store) FindMediaFilesByTagPatternsPage(tags []string, offset, limit int) ([]mediaFile, error) {
+	if len(tags) == 0 || limit <= 0 {
+		return []mediaFile{}, nil
+	}
+	tagQuery, args := tagPatternQuery(tags)
+	args = append(args, limit, offset)
+	return s.queryMediaFiles("SELECT filepath, mtime FROM media_files WHERE filepath IN ("+tagQuery+") ORDER BY mtime DESC LIMIT ? OFFSET ?", args...)
+}
+
+// CountMediaFilesByTagPatterns counts the indexed images matching every pattern.
+func (s *store) CountMediaFilesByTagPatterns(tags []string) (int, error) {
+	if len(tags) == 0 {
+		return 0, nil
+	}
+	tagQuery, args := tagPatternQuery(tags)
+	var count int
+	err := withSQLiteRetry(func() error {
+		return s.db.QueryRow("SELECT COUNT(*) FROM media_files WHERE filepath IN ("+tagQuery+")", args...).Scan(&count)
+	})
+	return count, err
+}
+
+func (s *store) queryMediaFiles(query string, args ...any) ([]mediaFile, error) {
+	items := make([]mediaFile, 0)
+	err := withSQLiteRetry(func() error {
+		items = items[:0]
+		rows, err := s.db.Query(query, args...)
+		if err != nil {
+			return err
+		}
+		defer rows.Close()
+		for rows.Next() {
+			var f mediaFile
+			if err := rows.Scan(&f.Path, &f.MTime); err != nil {
+				return err
+			}
+			items = append(items, f)
+		}
+		return rows.Err()
+	})
+	return items, err
+}
+
+// tagPatternQuery selects filepaths having a tag containing every pattern.
+// It reads image_tags once, grouping by file, rather than intersecting one
+// scan per pattern; the UNIQUE(filepath, tag) index covers the scan and
+// already yields rows in filepath order for the GROUP BY.
+func tagPatternQuery(tags []string) (string, []any) {
+	patterns := make([]any, 0, len(tags))
+	for _, tag := range tags {
+		patterns = append(patterns, "%"+strings.ToLower(strings.TrimSpace(tag))+"%")
+	}
+	match := make([]string, len(patterns))
+	for i := range match {
+		match[i] = "LOWER(tag) LIKE ?"
+	}
+	query := "SELECT filepath FROM image_tags WHERE " + strings.Join(match, " OR ") + " GROUP BY filepath"
+	if len(patterns) < 2 {
+		return query, patterns
+	}
+
+	having := make([]string, len(patterns))
+	for i := range having {
+		having[i] = "MAX(LOWER(tag) LIKE ?)"
+	}
+	query += " HAVING " + strings.Join(having, " AND ")
+	args := make([]any, 0, 2*len(patterns))
+	args = append(args, patterns...)
+	args = append(args, patterns...)
+	return query, args
+}
+
 func (s *store) FindFilesByExactTag(tag string) ([]string, error) {
 	tag = strings.TrimSpace(tag)
 	if tag == "" {
@@ -407,6 +1343,41 @@ func (s *store) DeleteTagsForFile(filepathVal string) error {
 	})
 }
 
+// DeleteTagsForFiles removes the tags of many files in one transaction,
+// 500 paths per DELETE.
+func (s *store) DeleteTagsForFiles(filepaths []string) error {
+	if len(filepaths) == 0 {
+		return nil
+	}
+	s.mu.Lock()
+	defer s.mu.Unlock()
+	return withSQLiteRetry(func() error {
+		tx, err := s.db.Begin()
+		if err != nil {
+			return err
+		}
+		defer tx.Rollback()
+
+		const chunkSize = 500
+		for start := 0; start < len(filepaths); start += chunkSize {
+			end := start + chunkSize
+			if end > len(filepaths) {
+				end = len(filepaths)
+			}
+			chunk := filepaths[start:end]
+			placeholders := strings.TrimRight(strings.Repeat("?,", len(chunk)), ",")
+			args := make([]any, 0, len(chunk))
+			for _, p := range chunk {
+				args = append(args, p)
+			}
+			if _, err := tx.Exec(fmt.Sprintf("DELETE FROM image_tags WHERE filepath IN (%s)", placeholders), args...); err != nil {
+				return err
+			}
+		}
+		return tx.Commit()
+	})
+}
+
 func (s *store) DeleteTagsForUser(username string) error {
 	s.mu.Lock()
 	defer s.mu.Unlock()
@@ -12,27 +12,48 @@ type config struct {
 	redisDB          int
 	queueName        string
 	interactiveQueue string
+	autotagQueue     string
+	workerQueues     []string
 	mediaRoot        string
 	dbPath           string
 	autotaggerURL    string
 	autotaggerEnable bool
 	concurrency      int
+	downloadConns    int
+	autotagConns     int
+	hashWorkers      int
+	phashDedup       bool
+	phashMaxDistance int
 	apiAddr          string
 }
 
 type appState struct {
 	cfg                config
+	mediaPrefix        string
 	redis              RedisClient
 	asynqCli           AsynqClient
 	store              TagStore
 	inspector          QueueInspector
+	tweetHTTPClient    *http.Client
 	downloadHTTPClient *http.Client
+	downloadSlots      chan struct{}
+	userCounts         *dirCountCache
 	autotagHTTPClient  *http.Client
+	autotagSlots       chan struct{}
 }
 
 type store struct {
 	db *sql.DB
 	mu sync.Mutex
+
+	processedStmt *sql.Stmt
+	fileHashStmt  *sql.Stmt
+
+	// mediaList caches ListMediaFiles until PRAGMA data_version shows a write
+	// from another process.
+	mediaMu          sync.Mutex
+	mediaList        []mediaFile
+	mediaDataVersion int64
 }
 
 type queueTaskStatus struct {
@@ -50,6 +71,11 @@ type autotagTaskPayload struct {
 	TaskID string `json:"task_id"`
 }
 
+type autotagFileTaskPayload struct {
+	Filepath string `json:"filepath"`
+	Hash     string `json:"hash"`
+}
+
 type deleteUserTaskPayload struct {
 	TaskID   string `json:"task_id"`
 	Username string `json:"username"`
@@ -106,7 +132,25 @@ type autotagResult struct {
 	Status  string `json:"status"`
 }
 
+type mediaFile struct {
+	Path  string
+	MTime int64
+}
+
+// remoteImage holds the HTTP validators last seen for an image URL and the
+// content hash that was downloaded from it.
+type remoteImage struct {
+	ETag         string
+	LastModified string
+	Hash         string
+}
+
 type imageTag struct {
 	Tag        string  `json:"tag"`
 	Confidence float64 `json:"confidence"`
 }
+
+type tagCount struct {
+	Tag   string `json:"tag"`
+	Count int    `json:"count"`
+}
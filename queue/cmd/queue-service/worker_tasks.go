@@ -1,10 +1,9 @@
 package main
 
 import (
+	"bufio"
 	"bytes"
 	"context"
-	"crypto/md5"
-	"encoding/hex"
 	"encoding/json"
 	"errors"
 	"fmt"
@@ -13,7 +12,6 @@ import (
 	"net/http"
 	"os"
 	"path/filepath"
-	"runtime"
 	"strconv"
 	"strings"
 	"sync"
@@ -39,7 +37,7 @@ func (st *appState) processDownloadTask(ctx context.Context, t *asynq.Task) erro
 	}
 
 	username := extractUsername(url)
-	imageURLs, err := getTweetImages(url)
+	imageURLs, err := getTweetImages(ctx, st.tweetHTTPClient, url)
 	if err != nil {
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
 		return err
@@ -60,14 +58,30 @@ func (st *appState) processDownloadTask(ctx context.Context, t *asynq.Task) erro
 			"task_id":  taskID,
 			"current":  0,
 			"total":    total,
-			"status":   fmt.Sprintf("Autotagging downloaded media for %s...", username),
+			"status":   fmt.Sprintf("Downloading media for %s; new files are queued for tagging...", username),
 			"username": username,
 			"url":      url,
 		})
 	}
 
+	// Images download concurrently; st.downloadSlots bounds connections across all tasks.
+	results := make(chan string, total)
+	var wg sync.WaitGroup
 	for i, imageURL := range imageURLs {
-		res := st.downloadImage(imageURL, url, username, i+1)
+		wg.Add(1)
+		go func(index int, imageURL string) {
+			defer wg.Done()
+			results <- st.downloadImage(ctx, imageURL, url, username, index)
+		}(i+1, imageURL)
+	}
+	go func() {
+		wg.Wait()
+		close(results)
+	}()
+
+	done := 0
+	for res := range results {
+		done++
 		switch res {
 		case "success":
 			success++
@@ -77,22 +91,27 @@ func (st *appState) processDownloadTask(ctx context.Context, t *asynq.Task) erro
 			failed++
 		}
 		setTaskState(ctx, st.redis, taskID, "PROGRESS", map[string]any{
-			"current": i + 1,
+			"current": done,
 			"total":   total,
 			"status":  fmt.Sprintf("saved:%d skipped:%d failed:%d", success, skipped, failed),
 		})
 		if st.cfg.autotaggerEnable && st.cfg.autotaggerURL != "" {
 			setDownloadAutotagState(ctx, st.redis, "PROGRESS", map[string]any{
 				"task_id":  taskID,
-				"current":  i + 1,
+				"current":  done,
 				"total":    total,
-				"status":   fmt.Sprintf("saved:%d skipped:%d failed:%d", success, skipped, failed),
+				"status":   fmt.Sprintf("saved:%d skipped:%d failed:%d, tagging queued:%d", success, skipped, failed, success),
 				"username": username,
 				"url":      url,
 			})
 		}
 	}
 
+	if success == 0 {
+		// Drop the user directory again if nothing was saved into it; Remove fails on non-empty dirs.
+		_ = os.Remove(filepath.Join(st.cfg.mediaRoot, username))
+	}
+
 	res := downloadResult{
 		URL:             url,
 		Success:         success > 0,
@@ -102,18 +121,29 @@ func (st *appState) processDownloadTask(ctx context.Context, t *asynq.Task) erro
 	}
 	setTaskState(ctx, st.redis, taskID, "SUCCESS", toMap(res))
 	if st.cfg.autotaggerEnable && st.cfg.autotaggerURL != "" {
-		finalStatus := "SUCCESS"
-		if success == 0 && failed > 0 {
-			finalStatus = "FAILURE"
+		// Saved files are tagged later on the autotag queue, so the state stays
+		// PENDING until settleDownloadAutotagState sees that queue drained.
+		finalStatus := "PENDING"
+		message := fmt.Sprintf("Tagging queued for %d new files from %s", success, username)
+		if success == 0 {
+			finalStatus = "SUCCESS"
+			if failed > 0 {
+				finalStatus = "FAILURE"
+			}
+			message = res.Message
 		}
 		setDownloadAutotagState(ctx, st.redis, finalStatus, map[string]any{
 			"task_id":  taskID,
 			"current":  total,
 			"total":    total,
-			"status":   res.Message,
+			"status":   message,
 			"username": username,
 			"url":      url,
 		})
+		if finalStatus == "PENDING" {
+			// The queued files may already have been tagged.
+			st.settleDownloadAutotagState(ctx, 0)
+		}
 	}
 	return nil
 }
@@ -148,22 +178,8 @@ func (st *appState) processAutotagAllTask(ctx context.Context, t *asynq.Task) er
 		return nil
 	}
 
-	processed := 0
 	total := len(files)
-	for _, full := range files {
-		rel := normalizeRelPath(st.cfg.mediaRoot, full)
-		hash, err := fileMD5(full)
-		if err == nil {
-			_ = st.autotagFile(full, rel, hash)
-			_ = st.store.MarkImageProcessed(hash)
-			processed++
-		}
-		setTaskState(ctx, st.redis, taskID, "PROGRESS", map[string]any{
-			"current": processed,
-			"total":   total,
-			"status":  fmt.Sprintf("Processed %d/%d (last: %s)", processed, total, rel),
-		})
-	}
+	processed := st.autotagFiles(ctx, taskID, files)
 
 	setTaskState(ctx, st.redis, taskID, "SUCCESS", toMap(autotagResult{Current: processed, Total: total, Status: fmt.Sprintf("Complete! Processed %d files.", processed)}))
 	return nil
@@ -193,7 +209,7 @@ func (st *appState) processAutotagUntaggedTask(ctx context.Context, t *asynq.Tas
 	}
 	untagged := make([]string, 0)
 	for _, full := range files {
-		rel := normalizeRelPath(st.cfg.mediaRoot, full)
+		rel := st.relMediaPath(full)
 		if _, ok := tagged[rel]; !ok {
 			untagged = append(untagged, full)
 		}
@@ -204,25 +220,111 @@ func (st *appState) processAutotagUntaggedTask(ctx context.Context, t *asynq.Tas
 		return nil
 	}
 
-	processed := 0
 	total := len(untagged)
-	for _, full := range untagged {
-		rel := normalizeRelPath(st.cfg.mediaRoot, full)
-		hash, err := fileMD5(full)
-		if err == nil {
-			_ = st.autotagFile(full, rel, hash)
-			_ = st.store.MarkImageProcessed(hash)
+	processed := st.autotagFiles(ctx, taskID, untagged)
+
+	setTaskState(ctx, st.redis, taskID, "SUCCESS", toMap(autotagResult{Current: processed, Total: total, Status: fmt.Sprintf("Complete! Processed %d files.", processed)}))
+	return nil
+}
+
+type autotaggedFile struct {
+	rel  string
+	hash string
+	tags map[string]float64
+	err  error
+}
+
+// autotagFiles runs files through a hash -> tag -> store pipeline: hashing
+// on the hash worker pool, autotagger requests on as many workers as
+// AUTOTAG_MAX_CONNS allows, and batched writes here. It returns the number
+// of files that were hashed and marked processed.
+func (st *appState) autotagFiles(ctx context.Context, taskID string, files []string) int {
+	hashed := hashFilesParallel(files, st.hashWorkerCount(), st.cachedFileHash)
+	tagged := make(chan autotaggedFile, cap(st.autotagSlots)*2)
+
+	var wg sync.WaitGroup
+	for i := 0; i < cap(st.autotagSlots); i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			for result := range hashed {
+				out := autotaggedFile{rel: st.relMediaPath(result.path), hash: result.hash, err: result.err}
+				if result.err == nil {
+					out.tags, _ = st.fetchAutotags(ctx, result.path, out.rel)
+				}
+				tagged <- out
+			}
+		}()
+	}
+	go func() {
+		wg.Wait()
+		close(tagged)
+	}()
+
+	processed := 0
+	total := len(files)
+	batch := newTagBatch(st.store)
+	for result := range tagged {
+		if result.err == nil {
+			batch.add(result.rel, result.hash, result.tags)
 			processed++
 		}
 		setTaskState(ctx, st.redis, taskID, "PROGRESS", map[string]any{
 			"current": processed,
 			"total":   total,
-			"status":  fmt.Sprintf("Processed %d/%d (last: %s)", processed, total, rel),
+			"status":  fmt.Sprintf("Processed %d/%d (last: %s)", processed, total, result.rel),
 		})
 	}
+	batch.flush()
+	st.checkpointStore()
+	return processed
+}
 
-	setTaskState(ctx, st.redis, taskID, "SUCCESS", toMap(autotagResult{Current: processed, Total: total, Status: fmt.Sprintf("Complete! Processed %d files.", processed)}))
-	return nil
+// checkpointStore folds the WAL written by a bulk job back into the
+// database file.
+func (st *appState) checkpointStore() {
+	if err := st.store.Checkpoint(); err != nil {
+		logger.Warn("wal checkpoint failed", "error", err)
+	}
+}
+
+const tagBatchSize = 256
+
+// tagBatch buffers autotag results and processed hashes so bulk tagging
+// commits once per tagBatchSize files instead of once per file.
+type tagBatch struct {
+	store  TagStore
+	items  map[string]map[string]float64
+	hashes []string
+}
+
+func newTagBatch(store TagStore) *tagBatch {
+	return &tagBatch{store: store, items: make(map[string]map[string]float64)}
+}
+
+func (b *tagBatch) add(rel, hash string, tags map[string]float64) {
+	b.hashes = append(b.hashes, hash)
+	if len(tags) > 0 {
+		b.items[rel] = tags
+	}
+	if len(b.hashes) >= tagBatchSize {
+		b.flush()
+	}
+}
+
+func (b *tagBatch) flush() {
+	if len(b.items) > 0 {
+		if err := b.store.AddTagsBulk(b.items); err != nil {
+			logger.Warn("failed to store autotag batch", "count", len(b.items), "error", err)
+		}
+		b.items = make(map[string]map[string]float64)
+	}
+	if len(b.hashes) > 0 {
+		if _, err := b.store.MarkImagesProcessed(b.hashes); err != nil {
+			logger.Warn("failed to mark autotag batch processed", "count", len(b.hashes), "error", err)
+		}
+		b.hashes = b.hashes[:0]
+	}
 }
 
 func (st *appState) processReconcileDBTask(ctx context.Context, t *asynq.Task) error {
@@ -235,6 +337,7 @@ func (st *appState) processReconcileDBTask(ctx context.Context, t *asynq.Task) e
 		taskID = uuid.NewString()
 	}
 
+	removedTempCount := removeStaleDownloads(st.cfg.mediaRoot)
 	files, err := listImageFiles(st.cfg.mediaRoot)
 	if err != nil {
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
@@ -249,58 +352,21 @@ func (st *appState) processReconcileDBTask(ctx context.Context, t *asynq.Task) e
 	})
 
 	existingPaths := make(map[string]struct{}, len(files))
-	existingHashes := make(map[string]struct{}, len(files))
+	// Keep digests as packed uint64 keys; hex string keys cost several times
+	// more memory per entry on large libraries.
+	existingHashes := make(map[uint64]struct{}, len(files))
 	hashReadErrors := 0
 
-	for _, full := range files {
-		rel := normalizeRelPath(st.cfg.mediaRoot, full)
-		existingPaths[rel] = struct{}{}
-	}
-
-	type hashResult struct {
-		hash string
-		err  error
-	}
-
-	workerCount := runtime.NumCPU()
-	if workerCount < 2 {
-		workerCount = 2
-	}
-	if workerCount > 8 {
-		workerCount = 8
-	}
-
-	jobs := make(chan string, workerCount*2)
-	results := make(chan hashResult, workerCount*2)
-
-	var wg sync.WaitGroup
-	wg.Add(workerCount)
-	for i := 0; i < workerCount; i++ {
-		go func() {
-			defer wg.Done()
-			for full := range jobs {
-				hash, err := fileMD5(full)
-				results <- hashResult{hash: hash, err: err}
-			}
-		}()
-	}
-
-	go func() {
-		for _, full := range files {
-			jobs <- full
-		}
-		close(jobs)
-		wg.Wait()
-		close(results)
-	}()
+	results := hashFilesParallel(files, st.hashWorkerCount(), st.cachedFileHash)
 
 	scanned := 0
 	for result := range results {
 		scanned++
+		existingPaths[st.relMediaPath(result.path)] = struct{}{}
 		if result.err != nil {
 			hashReadErrors++
-		} else {
-			existingHashes[result.hash] = struct{}{}
+		} else if digest, ok := parseContentHash(result.hash); ok {
+			existingHashes[digest] = struct{}{}
 		}
 
 		if scanned%100 == 0 || scanned == total {
@@ -318,32 +384,80 @@ func (st *appState) processReconcileDBTask(ctx context.Context, t *asynq.Task) e
 		return err
 	}
 	staleHashes := make([]string, 0)
+	processedSet := make(map[uint64]struct{}, len(processedHashes))
 	for _, h := range processedHashes {
-		if _, ok := existingHashes[h]; !ok {
+		// Digests from another algorithm never parse and are always stale.
+		digest, ok := parseContentHash(h)
+		if ok {
+			processedSet[digest] = struct{}{}
+		}
+		if _, exists := existingHashes[digest]; !ok || !exists {
 			staleHashes = append(staleHashes, h)
 		}
 	}
 
+	// Backfill hashes of files on disk so dedup keeps working after a hash algorithm change.
+	missingHashes := make([]string, 0)
+	for digest := range existingHashes {
+		if _, ok := processedSet[digest]; !ok {
+			missingHashes = append(missingHashes, formatContentHash(digest))
+		}
+	}
+	backfilledHashCount, err := st.store.MarkImagesProcessed(missingHashes)
+	if err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
+
 	removedHashCount, err := st.store.DeleteProcessedHashes(staleHashes)
 	if err != nil {
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
 		return err
 	}
+	removedRemoteCount, err := st.store.PruneRemoteImages()
+	if err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
 
 	taggedPaths, err := st.store.GetAllTaggedFilepaths()
 	if err != nil {
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
 		return err
 	}
-	removedTagPathCount := 0
+	missingTagPaths := make([]string, 0)
 	for p := range taggedPaths {
-		if _, ok := existingPaths[p]; ok {
-			continue
+		if _, ok := existingPaths[p]; !ok {
+			missingTagPaths = append(missingTagPaths, p)
 		}
-		if err := st.store.DeleteTagsForFile(p); err == nil {
-			removedTagPathCount++
+	}
+	removedTagPathCount := 0
+	if err := st.store.DeleteTagsForFiles(missingTagPaths); err == nil {
+		removedTagPathCount = len(missingTagPaths)
+	}
+
+	if _, err := st.reindexMediaFiles(); err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
+
+	hashedPaths, err := st.store.GetAllFileHashPaths()
+	if err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
+	missingHashedPaths := make([]string, 0)
+	for _, p := range hashedPaths {
+		if _, ok := existingPaths[p]; !ok {
+			missingHashedPaths = append(missingHashedPaths, p)
 		}
 	}
+	removedFileHashCount, err := st.store.DeleteFileHashes(missingHashedPaths)
+	if err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
+	st.checkpointStore()
 
 	setTaskState(ctx, st.redis, taskID, "SUCCESS", map[string]any{
 		"success":                 true,
@@ -351,12 +465,37 @@ func (st *appState) processReconcileDBTask(ctx context.Context, t *asynq.Task) e
 		"scanned_files":           total,
 		"db_hashes_total":         len(processedHashes),
 		"removed_stale_hashes":    removedHashCount,
+		"backfilled_hashes":       backfilledHashCount,
 		"removed_missing_tagsets": removedTagPathCount,
+		"removed_file_hashes":     removedFileHashCount,
+		"removed_remote_images":   removedRemoteCount,
+		"removed_temp_files":      removedTempCount,
 		"hash_read_errors":        hashReadErrors,
 	})
 	return nil
 }
 
+// enqueueHashIndexBackfill queues a one-time reconcile when the media tree has
+// files but no dedup hashes for the current algorithm, e.g. after upgrading
+// from MD5 or restoring media without the database.
+func (st *appState) enqueueHashIndexBackfill(ctx context.Context) {
+	count, err := st.store.CountProcessedImages()
+	if err != nil || count > 0 {
+		return
+	}
+	if !hasAnyImage(st.cfg.mediaRoot) || st.isTrackedTaskBusy(ctx, autotagLastTask) {
+		return
+	}
+	taskID := uuid.NewString()
+	if err := st.enqueueTask(taskTypeReconcileDB, st.cfg.queueName, taskID, autotagTaskPayload{TaskID: taskID}, 12*time.Hour); err != nil {
+		logger.Error("failed to enqueue hash index backfill", "task_id", taskID, "error", err)
+		return
+	}
+	st.redis.Set(ctx, autotagLastTask, taskID, 7*24*time.Hour)
+	setTaskState(ctx, st.redis, taskID, "PENDING", map[string]any{"status": "Task is pending..."})
+	logger.Info("hash index backfill queued", "task_id", taskID)
+}
+
 func (st *appState) processDeleteUserTask(ctx context.Context, t *asynq.Task) error {
 	var payload deleteUserTaskPayload
 	if err := json.Unmarshal(t.Payload(), &payload); err != nil {
@@ -389,6 +528,10 @@ func (st *appState) processDeleteUserTask(ctx context.Context, t *asynq.Task) er
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
 		return err
 	}
+	if err := st.store.DeleteMediaFilesForUser(username); err != nil {
+		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
+		return err
+	}
 
 	setTaskState(ctx, st.redis, taskID, "SUCCESS", map[string]any{
 		"success":        true,
@@ -431,6 +574,7 @@ func (st *appState) processDeleteImageTask(ctx context.Context, t *asynq.Task) e
 		return err
 	}
 	_ = st.store.DeleteTagsForFile(rel)
+	_ = st.store.DeleteMediaFiles([]string{rel})
 	_ = cleanupEmptyParents(full, st.cfg.mediaRoot)
 	setTaskState(ctx, st.redis, taskID, "SUCCESS", map[string]any{
 		"success":  true,
@@ -472,6 +616,9 @@ func (st *appState) processDeleteImagesTask(ctx context.Context, t *asynq.Task)
 		"message": "Deleting images...",
 	})
 
+	// Index rows of removed files are dropped in batches at each progress
+	// update rather than with two statements per file.
+	removed := make([]string, 0, 20)
 	for i, rel := range filepaths {
 		full, err := resolvePathUnderRoot(st.cfg.mediaRoot, rel)
 		if err != nil {
@@ -485,12 +632,15 @@ func (st *appState) processDeleteImagesTask(ctx context.Context, t *asynq.Task)
 				}
 			} else {
 				deleted++
-				_ = st.store.DeleteTagsForFile(rel)
+				removed = append(removed, rel)
 				_ = cleanupEmptyParents(full, st.cfg.mediaRoot)
 			}
 		}
 
 		if i%20 == 0 || i == total-1 {
+			_ = st.store.DeleteTagsForFiles(removed)
+			_ = st.store.DeleteMediaFiles(removed)
+			removed = removed[:0]
 			setTaskState(ctx, st.redis, taskID, "PROGRESS", map[string]any{
 				"current": i + 1,
 				"total":   total,
@@ -531,7 +681,7 @@ func (st *appState) processRetagImageTask(ctx context.Context, t *asynq.Task) er
 		return err
 	}
 	setTaskState(ctx, st.redis, taskID, "PROGRESS", map[string]any{"message": "Retagging image...", "current": 0, "total": 1})
-	result, err := st.retagSingleFile(rel, false)
+	result, err := st.retagSingleFile(ctx, rel, false)
 	if err != nil {
 		setTaskState(ctx, st.redis, taskID, "FAILURE", map[string]any{"message": err.Error()})
 		return err
@@ -581,7 +731,7 @@ func (st *appState) processRetagImagesTask(ctx context.Context, t *asynq.Task) e
 	})
 
 	for i, rel := range filepaths {
-		result, err := st.retagSingleFile(rel, true)
+		result, err := st.retagSingleFile(ctx, rel, true)
 		if err != nil {
 			failed++
 		} else if result == "skipped" {
@@ -620,7 +770,7 @@ func (st *appState) processRetagImagesTask(ctx context.Context, t *asynq.Task) e
 
 // retagSingleFile returns "success" when tags were generated and "skipped" when existing tags were kept.
 // When force is true, existing tags are removed and regenerated.
-func (st *appState) retagSingleFile(rel string, force bool) (string, error) {
+func (st *appState) retagSingleFile(ctx context.Context, rel string, force bool) (string, error) {
 	existing, err := st.store.GetTagsForFiles([]string{rel})
 	if err != nil {
 		return "", err
@@ -639,51 +789,122 @@ func (st *appState) retagSingleFile(rel string, force bool) (string, error) {
 	if err != nil {
 		return "", errors.New("invalid filepath")
 	}
-	if _, err := os.Stat(full); err != nil {
+	// The tagger does not need the hash; it is only recorded so the image
+	// counts as processed, and file_hashes usually answers it without a read.
+	hash, err := st.cachedFileHashAt(full, rel)
+	if errors.Is(err, os.ErrNotExist) {
 		return "", errors.New("file not found")
 	}
-
-	hash, err := fileMD5(full)
 	if err != nil {
 		return "", errors.New("could not read file")
 	}
-	_ = st.autotagFile(full, rel, hash)
+	_ = st.autotagFile(ctx, full, rel)
 	_ = st.store.MarkImageProcessed(hash)
 	return "success", nil
 }
 
-func (st *appState) downloadImage(imageURL, tweetURL, username string, index int) string {
-	req, _ := http.NewRequest(http.MethodGet, imageURL, nil)
-	req.Header.Set("User-Agent", "Mozilla/5.0")
+var fileWriterPool = sync.Pool{
+	New: func() any { return bufio.NewWriterSize(nil, 1<<20) },
+}
+
+func (st *appState) downloadImage(ctx context.Context, imageURL, tweetURL, username string, index int) string {
+	// Hold a download slot only while the response body is being transferred.
+	select {
+	case st.downloadSlots <- struct{}{}:
+	case <-ctx.Done():
+		return "failed"
+	}
+	released := false
+	releaseSlot := func() {
+		if !released {
+			released = true
+			<-st.downloadSlots
+		}
+	}
+	defer releaseSlot()
+
+	req, _ := http.NewRequestWithContext(ctx, http.MethodGet, imageURL, nil)
+	st.setRemoteValidators(req, imageURL)
 	resp, err := st.downloadHTTPClient.Do(req)
 	if err != nil {
 		return "failed"
 	}
 	defer resp.Body.Close()
+	if resp.StatusCode == http.StatusNotModified {
+		// Validators are only sent for URLs whose content is still recorded as processed.
+		return "skipped"
+	}
 	if resp.StatusCode >= 400 {
 		return "failed"
 	}
-	body, err := io.ReadAll(resp.Body)
-	if err != nil || len(body) == 0 {
+	tweetID := tweetIDFromURL(tweetURL)
+	ext := extFromContentType(resp.Header.Get("content-type"))
+	userDir := filepath.Join(st.cfg.mediaRoot, username)
+	if err := os.MkdirAll(userDir, 0o755); err != nil {
 		return "failed"
 	}
+	filename := fmt.Sprintf("%s_%02d%s", tweetID, index, ext)
+	fullPath := filepath.Join(userDir, filename)
 
-	hashArr := md5.Sum(body)
-	hash := hex.EncodeToString(hashArr[:])
+	// Stream the body to a temp file while hashing, then dedup and rename into place.
+	tmp, err := os.CreateTemp(userDir, ".download-*")
+	if errors.Is(err, os.ErrNotExist) {
+		// A concurrent task for the same user may have just removed the empty directory.
+		if err := os.MkdirAll(userDir, 0o755); err != nil {
+			return "failed"
+		}
+		tmp, err = os.CreateTemp(userDir, ".download-*")
+	}
+	if err != nil {
+		return "failed"
+	}
+	// The temp file stays open through the rename so pHash and the autotag
+	// upload can read the content back without reopening it.
+	defer tmp.Close()
+	tmpPath := tmp.Name()
+	discard := func() {
+		_ = os.Remove(tmpPath)
+	}
+	h := newContentHasher()
+	// Network reads arrive in TLS-record-sized pieces; coalesce them so each
+	// image hits the disk in a few large write(2) calls.
+	bw := fileWriterPool.Get().(*bufio.Writer)
+	bw.Reset(tmp)
+	written, err := io.Copy(io.MultiWriter(bw, h), resp.Body)
+	if err == nil {
+		err = bw.Flush()
+	}
+	bw.Reset(nil)
+	fileWriterPool.Put(bw)
+	if err == nil {
+		err = tmp.Chmod(0o644)
+	}
+	releaseSlot()
+	if err != nil || written == 0 {
+		discard()
+		return "failed"
+	}
+
+	hash := contentDigest(h)
+	st.rememberRemoteImage(imageURL, resp.Header, hash)
 	processed, err := st.store.IsImageProcessed(hash)
 	if err == nil && processed {
+		discard()
 		return "skipped"
 	}
 
-	tweetID := tweetIDFromURL(tweetURL)
-	ext := extFromContentType(resp.Header.Get("content-type"))
-	userDir := filepath.Join(st.cfg.mediaRoot, username)
-	if err := os.MkdirAll(userDir, 0o755); err != nil {
-		return "failed"
+	phash, hasPHash := uint64(0), false
+	if st.cfg.phashDedup {
+		phash, hasPHash = contentPHash(io.NewSectionReader(tmp, 0, written))
+		if hasPHash && st.hasSimilarImage(phash) {
+			discard()
+			_ = st.store.MarkImageProcessed(hash)
+			return "skipped"
+		}
 	}
-	filename := fmt.Sprintf("%s_%02d%s", tweetID, index, ext)
-	fullPath := filepath.Join(userDir, filename)
-	if err := os.WriteFile(fullPath, body, 0o644); err != nil {
+
+	if err := os.Rename(tmpPath, fullPath); err != nil {
+		discard()
 		return "failed"
 	}
 
@@ -691,54 +912,216 @@ func (st *appState) downloadImage(imageURL, tweetURL, username string, index int
 	if err := st.store.MarkImageProcessed(hash); err != nil {
 		return "failed"
 	}
-	_ = st.autotagFile(fullPath, relPath, hash)
+	if hasPHash {
+		_ = st.store.PutImagePHash(relPath, phash)
+	}
+	// Rename keeps the inode's size and mtime, so fstat the open temp file
+	// rather than resolving the final path again.
+	if info, err := tmp.Stat(); err == nil {
+		_ = st.store.PutFileHash(relPath, info.Size(), info.ModTime().UnixNano(), hash)
+		_ = st.store.UpsertMediaFile(relPath, info.ModTime().UnixMilli())
+	}
+	// Hand tagging to the autotag queue so this download slot's worker is not
+	// held for the autotagger round-trip; tag inline only if enqueueing fails.
+	if st.cfg.autotaggerEnable && st.cfg.autotaggerURL != "" {
+		if err := st.enqueueAutotagFile(relPath, hash); err != nil {
+			logger.Warn("failed to enqueue autotag, tagging inline", "filepath", relPath, "error", err)
+			if tags, err := st.fetchAutotagsFrom(ctx, filename, tmp, written, relPath); err == nil && len(tags) > 0 {
+				_ = st.store.AddTags(relPath, tags)
+			}
+		}
+	}
 	return "success"
 }
 
-func (st *appState) autotagFile(fullPath, relativePath, _ string) error {
-	if !st.cfg.autotaggerEnable || st.cfg.autotaggerURL == "" {
+func (st *appState) enqueueAutotagFile(rel, hash string) error {
+	payload := autotagFileTaskPayload{Filepath: rel, Hash: hash}
+	// Nothing else re-tags a freshly downloaded file, so ride out a tagger
+	// outage with retries instead of dropping its tags.
+	return st.enqueueTask(taskTypeAutotagFile, st.cfg.autotagQueue, uuid.NewString(), payload, 10*time.Minute, asynq.MaxRetry(autotagFileMaxRetry))
+}
+
+func (st *appState) processAutotagFileTask(ctx context.Context, t *asynq.Task) error {
+	err := st.autotagQueuedFile(ctx, t)
+	// Settle once the task will not run again: it succeeded, failed for good,
+	// or used up its retries. This task is still counted as active meanwhile.
+	if retried, _ := asynq.GetRetryCount(ctx); err == nil || errors.Is(err, asynq.SkipRetry) || retried >= autotagFileMaxRetry {
+		st.settleDownloadAutotagState(ctx, 1)
+	}
+	return err
+}
+
+func (st *appState) autotagQueuedFile(ctx context.Context, t *asynq.Task) error {
+	var payload autotagFileTaskPayload
+	if err := json.Unmarshal(t.Payload(), &payload); err != nil {
+		return fmt.Errorf("invalid autotag payload: %v: %w", err, asynq.SkipRetry)
+	}
+	rel := normalizeFilepath(payload.Filepath)
+	full, err := resolvePathUnderRoot(st.cfg.mediaRoot, rel)
+	if err != nil {
+		return fmt.Errorf("invalid filepath %q: %v: %w", rel, err, asynq.SkipRetry)
+	}
+	// The download recorded this hash in file_hashes, so the check is normally
+	// a cache hit. A mismatch means the file was replaced after enqueueing.
+	current, err := st.cachedFileHashAt(full, rel)
+	if err == nil && current != payload.Hash {
+		logger.Info("skipping autotag for replaced file", "filepath", rel)
 		return nil
 	}
+	var tags map[string]float64
+	if err == nil {
+		tags, err = st.fetchAutotags(ctx, full, rel)
+	}
+	if errors.Is(err, os.ErrNotExist) {
+		// Deleted before its turn in the queue.
+		return nil
+	}
+	if err != nil || len(tags) == 0 {
+		return err
+	}
+	return st.store.AddTags(rel, tags)
+}
+
+// settleDownloadAutotagState marks the download-triggered tagging state done
+// once nothing is left waiting or running on the autotag queue; self is the
+// number of active tasks that belong to the caller.
+func (st *appState) settleDownloadAutotagState(ctx context.Context, self int) {
+	rec, ok := getDownloadAutotagState(ctx, st.redis)
+	if !ok || rec.Status != "PENDING" {
+		return
+	}
+	q, err := st.inspector.GetQueueInfo(st.cfg.autotagQueue)
+	if err != nil || q.Pending+q.Scheduled+q.Retry+q.Active-self > 0 {
+		return
+	}
+	resultMap, _ := rec.Result.(map[string]any)
+	if resultMap == nil {
+		resultMap = map[string]any{}
+	}
+	resultMap["status"] = "Tagged queued downloads"
+	setDownloadAutotagState(ctx, st.redis, "SUCCESS", resultMap)
+}
+
+// setRemoteValidators makes the image request conditional when imageURL was
+// fetched before and its content is still a known duplicate, so a re-scraped
+// tweet costs a 304 instead of the full image body.
+func (st *appState) setRemoteValidators(req *http.Request, imageURL string) {
+	remote, ok, err := st.store.GetRemoteImage(imageURL)
+	if err != nil || !ok {
+		return
+	}
+	if processed, err := st.store.IsImageProcessed(remote.Hash); err != nil || !processed {
+		return
+	}
+	if remote.ETag != "" {
+		req.Header.Set("If-None-Match", remote.ETag)
+	} else if remote.LastModified != "" {
+		req.Header.Set("If-Modified-Since", remote.LastModified)
+	}
+}
+
+func (st *appState) rememberRemoteImage(imageURL string, header http.Header, hash string) {
+	remote := remoteImage{
+		ETag:         header.Get("ETag"),
+		LastModified: header.Get("Last-Modified"),
+		Hash:         hash,
+	}
+	if remote.ETag == "" && remote.LastModified == "" {
+		return
+	}
+	if err := st.store.PutRemoteImage(imageURL, remote); err != nil {
+		logger.Warn("failed to record image validators", "url", imageURL, "error", err)
+	}
+}
+
+func contentPHash(content io.ReadSeeker) (uint64, bool) {
+	phash, err := imageDHash(content)
+	if err != nil {
+		return 0, false
+	}
+	return phash, true
+}
+
+// hasSimilarImage reports whether a stored image that still exists on disk is
+// perceptually within phashMaxDistance of phash.
+func (st *appState) hasSimilarImage(phash uint64) bool {
+	candidates, err := st.store.FindSimilarImages(phash, st.cfg.phashMaxDistance)
+	if err != nil {
+		return false
+	}
+	for _, rel := range candidates {
+		full, err := resolvePathUnderRoot(st.cfg.mediaRoot, rel)
+		if err != nil {
+			continue
+		}
+		if _, err := os.Stat(full); err == nil {
+			return true
+		}
+	}
+	return false
+}
+
+func (st *appState) autotagFile(ctx context.Context, fullPath, relativePath string) error {
+	tags, err := st.fetchAutotags(ctx, fullPath, relativePath)
+	if err != nil || len(tags) == 0 {
+		return err
+	}
+	return st.store.AddTags(relativePath, tags)
+}
+
+// fetchAutotags asks the autotagger for fullPath's tags above the confidence
+// cutoff without storing them.
+func (st *appState) fetchAutotags(ctx context.Context, fullPath, relativePath string) (map[string]float64, error) {
+	if !st.cfg.autotaggerEnable || st.cfg.autotaggerURL == "" {
+		return nil, nil
+	}
+	f, err := os.Open(fullPath)
+	if err != nil {
+		return nil, err
+	}
+	defer f.Close()
+	info, err := f.Stat()
+	if err != nil {
+		return nil, err
+	}
+	return st.fetchAutotagsFrom(ctx, filepath.Base(fullPath), f, info.Size(), relativePath)
+}
+
+// fetchAutotagsFrom uploads size bytes of content as filename. Taking a
+// ReaderAt lets the download path reuse its still-open temp file, and lets
+// retries re-read the content without reopening anything.
+func (st *appState) fetchAutotagsFrom(ctx context.Context, filename string, content io.ReaderAt, size int64, relativePath string) (map[string]float64, error) {
+	if !st.cfg.autotaggerEnable || st.cfg.autotaggerURL == "" {
+		return nil, nil
+	}
 
 	const maxAutotagAttempts = 5
 
 	var respBody []byte
 	var lastErr error
 	for attempt := 1; attempt <= maxAutotagAttempts; attempt++ {
-		f, err := os.Open(fullPath)
+		body, err := newMultipartBody(filename, io.NewSectionReader(content, 0, size), size)
 		if err != nil {
-			return err
+			return nil, err
 		}
 
-		var body bytes.Buffer
-		writer := multipart.NewWriter(&body)
-		part, err := writer.CreateFormFile("file", filepath.Base(fullPath))
-		if err != nil {
-			f.Close()
-			return err
-		}
-		if _, err := io.Copy(part, f); err != nil {
-			f.Close()
-			return err
-		}
-		if err := writer.WriteField("format", "json"); err != nil {
-			f.Close()
-			return err
-		}
-		if err := writer.Close(); err != nil {
-			f.Close()
-			return err
+		req, _ := http.NewRequestWithContext(ctx, http.MethodPost, st.cfg.autotaggerURL, body)
+		req.ContentLength = body.size
+		req.Header.Set("Content-Type", body.contentType)
+		// The autotagger is sized independently of downloads; cap in-flight requests to it.
+		if err := ctx.Err(); err != nil {
+			return nil, err
 		}
-		if err := f.Close(); err != nil {
-			return err
+		select {
+		case st.autotagSlots <- struct{}{}:
+		case <-ctx.Done():
+			return nil, ctx.Err()
 		}
-
-		req, _ := http.NewRequest(http.MethodPost, st.cfg.autotaggerURL, &body)
-		req.Header.Set("Content-Type", writer.FormDataContentType())
 		resp, err := st.autotagHTTPClient.Do(req)
+		<-st.autotagSlots
 		if err != nil {
 			lastErr = err
-			return err
+			return nil, err
 		}
 
 		func() {
@@ -753,7 +1136,11 @@ func (st *appState) autotagFile(fullPath, relativePath, _ string) error {
 						"max_attempts", maxAutotagAttempts,
 						"wait", wait.String(),
 					)
-					time.Sleep(wait)
+					// A cancelled task stops waiting; the next attempt returns ctx.Err().
+					select {
+					case <-time.After(wait):
+					case <-ctx.Done():
+					}
 					return
 				}
 			}
@@ -771,21 +1158,21 @@ func (st *appState) autotagFile(fullPath, relativePath, _ string) error {
 			continue
 		}
 		if lastErr != nil {
-			return lastErr
+			return nil, lastErr
 		}
 	}
 	if lastErr != nil {
-		return lastErr
+		return nil, lastErr
 	}
 
 	var parsed []struct {
 		Tags map[string]float64 `json:"tags"`
 	}
 	if err := json.Unmarshal(respBody, &parsed); err != nil {
-		return err
+		return nil, err
 	}
 	if len(parsed) == 0 || len(parsed[0].Tags) == 0 {
-		return nil
+		return nil, nil
 	}
 
 	tags := make(map[string]float64)
@@ -794,10 +1181,40 @@ func (st *appState) autotagFile(fullPath, relativePath, _ string) error {
 			tags[tag] = conf
 		}
 	}
-	if len(tags) == 0 {
-		return nil
-	}
-	return st.store.AddTags(relativePath, tags)
+	return tags, nil
+}
+
+// multipartBody streams an autotagger upload from its source so the image
+// is never held in memory as a whole.
+type multipartBody struct {
+	io.Reader
+	size        int64
+	contentType string
+}
+
+func newMultipartBody(filename string, content io.Reader, contentSize int64) (*multipartBody, error) {
+	// Render the part headers and the trailing form fields around the file
+	// contents; only these small framing pieces are buffered.
+	var framing bytes.Buffer
+	writer := multipart.NewWriter(&framing)
+	if _, err := writer.CreateFormFile("file", filename); err != nil {
+		return nil, err
+	}
+	headLen := framing.Len()
+	if err := writer.WriteField("format", "json"); err != nil {
+		return nil, err
+	}
+	if err := writer.Close(); err != nil {
+		return nil, err
+	}
+	head := framing.Bytes()[:headLen]
+	tail := framing.Bytes()[headLen:]
+
+	return &multipartBody{
+		Reader:      io.MultiReader(bytes.NewReader(head), content, bytes.NewReader(tail)),
+		size:        int64(len(head)) + contentSize + int64(len(tail)),
+		contentType: writer.FormDataContentType(),
+	}, nil
 }
 
 func retryAfterDelay(retryAfter string, attempt int) time.Duration {
@@ -3,6 +3,7 @@ module x-media-downloder/queue
 go 1.23
 
 require (
+	github.com/cespare/xxhash/v2 v2.2.0
 	github.com/google/uuid v1.6.0
 	github.com/hibiken/asynq v0.25.1
 	github.com/redis/go-redis/v9 v9.7.0
@@ -10,7 +11,6 @@ require (
 )
 
 require (
-	github.com/cespare/xxhash/v2 v2.2.0 // indirect
 	github.com/dgryski/go-rendezvous v0.0.0-20200823014737-9f7001d12a5f // indirect
 	github.com/dustin/go-humanize v1.0.1 // indirect
 	github.com/remyoudompheng/bigfft v0.0.0-20230129092748-24d4a6f8daec // indirect
@@ -6,6 +6,9 @@ import { getMimeType } from "https://deno.land/x/hono@v3.7.4/utils/mime.ts";
 import { getMediaRoot } from "../../utils/media_root.ts";
 
 const UPLOAD_FOLDER = getMediaRoot();
+// When set (e.g. "/_internal_images/"), nginx serves the file body via sendfile.
+const ACCEL_REDIRECT_PREFIX = Deno.env.get("IMAGES_ACCEL_REDIRECT_PREFIX") ||
+  "";
 
 export const handler = async (
   _req: Request,
@@ -48,12 +51,26 @@ export const handler = async (
       });
     }
 
-    const file = await Deno.open(fullPath, { read: true });
-    const readable = file.readable;
-
     const contentType = getMimeType(normalizedRelative) ||
       "application/octet-stream";
 
+    if (ACCEL_REDIRECT_PREFIX) {
+      const internalPath = ACCEL_REDIRECT_PREFIX +
+        relativeToRoot.split(/[\\/]/).map(encodeURIComponent).join("/");
+      return new Response(null, {
+        headers: {
+          "Content-Type": contentType,
+          "X-Accel-Redirect": internalPath,
+          ETag: etag,
+          "Cache-Control": "public, max-age=3600",
+          "Last-Modified": new Date(mtimeMs).toUTCString(),
+        },
+      });
+    }
+
+    const file = await Deno.open(fullPath, { read: true });
+    const readable = file.readable;
+
     return new Response(readable, {
       headers: {
         "Content-Type": contentType,